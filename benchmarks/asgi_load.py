@@ -0,0 +1,194 @@
+"""
+Load test: the Flask app under a WSGI server against asgi.py under an ASGI server.
+
+Each server is started on the sample site in turn. The test then holds
+`--connections` keep-alive connections open, each sending GETs back to back
+for `--duration` seconds, and reports throughput and latency percentiles.
+Only the standard library is used on the client side, so the numbers don't
+depend on an HTTP client's own overhead.
+
+    pip install gunicorn uvicorn
+    python benchmarks/asgi_load.py
+    python benchmarks/asgi_load.py --connections 500 --duration 30 --path / --path /rss.xml
+
+To measure a server that is already running, pass its URL instead:
+
+    python benchmarks/asgi_load.py --url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import os
+from pathlib import Path
+import resource
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+SITE = Path(__file__).resolve().parent.parent / 'etch'
+
+# Both servers get the same number of processes; the WSGI one needs a thread
+# per concurrent request, the ASGI one uses asgi.threads only for misses.
+SERVERS = {
+    'wsgi': ['gunicorn', '--workers', '{workers}', '--worker-class', 'gthread',
+             '--threads', '32', '--bind', '127.0.0.1:{port}', '--log-level', 'warning',
+             'app:app'],
+    'asgi': ['uvicorn', '--workers', '{workers}', '--host', '127.0.0.1', '--port', '{port}',
+             '--log-level', 'warning', '--no-access-log', 'asgi:application'],
+}
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep-alive)"""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif status not in (204, 304):
+        await reader.read()  # Delimited by closing the connection
+        return status, False
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def connection(host, port, paths, deadline, latencies, counts):
+    """Send requests over one keep-alive connection until the deadline"""
+    reader = writer = None
+    i = 0
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                         "Accept-Encoding: gzip\r\n\r\n".encode('latin-1'))
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            counts['errors'] += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            await asyncio.sleep(0.01)
+            continue
+        latencies.append(time.perf_counter() - start)
+        counts['ok' if status < 500 else 'errors'] += 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(host, port, paths, connections, duration):
+    """Run the load and return (requests, errors, latencies, elapsed seconds)"""
+    latencies, counts = [], {'ok': 0, 'errors': 0}
+    start = time.perf_counter()
+    deadline = start + duration
+    await asyncio.gather(*(connection(host, port, paths, deadline, latencies, counts)
+                           for _ in range(connections)))
+    return counts['ok'], counts['errors'], latencies, time.perf_counter() - start
+
+
+def percentile(ordered, fraction):
+    """The value below which a fraction of a sorted list falls"""
+    if not ordered:
+        return float('nan')
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(name, ok, errors, latencies, elapsed):
+    latencies.sort()
+    print(f"{name:>5}: {ok / elapsed:9.0f} req/s  "
+          f"p50 {percentile(latencies, 0.50) * 1000:7.1f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+          f"max {percentile(latencies, 1.0) * 1000:7.1f} ms  "
+          f"({ok} ok, {errors} errors)")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=60):
+    """Wait until a server accepts connections"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server didn't start listening on port {port}")
+
+
+def benchmark_server(name, args):
+    """Start one server, warm its caches, load it and stop it"""
+    port = free_port()
+    command = [part.format(port=port, workers=args.workers) for part in SERVERS[name]]
+    env = dict(os.environ, PYTHONPATH=str(args.site))
+    process = subprocess.Popen(command, cwd=args.site, env=env)
+    try:
+        wait_for_port(port, process)
+        # One pass over the paths fills the response cache, as on a live site
+        asyncio.run(run_load('127.0.0.1', port, args.path, 1, 1.0))
+        report(name, *asyncio.run(run_load('127.0.0.1', port, args.path,
+                                           args.connections, args.duration)))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def raise_file_limit(connections):
+    """Make room for one socket per connection, plus the server's when local"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, max(soft, connections * 2 + 256))
+    if wanted > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-c', '--connections', type=int, default=500)
+    parser.add_argument('-d', '--duration', type=float, default=20.0, help="Seconds per server")
+    parser.add_argument('-w', '--workers', type=int, default=4, help="Server processes")
+    parser.add_argument('--path', action='append', help="Path to request (repeatable, default /)")
+    parser.add_argument('--site', type=Path, default=SITE, help="Site directory to serve")
+    parser.add_argument('--server', choices=sorted(SERVERS), action='append',
+                        help="Server to test (repeatable, default both)")
+    parser.add_argument('--url', help="Load a server that is already running instead")
+    args = parser.parse_args(argv)
+    args.path = args.path or ['/']
+    raise_file_limit(args.connections)
+
+    print(f"{args.connections} connections, {args.duration:g}s, paths {', '.join(args.path)}")
+    if args.url:
+        url = urlparse(args.url)
+        report(url.netloc, *asyncio.run(run_load(url.hostname, url.port or 80, args.path,
+                                                 args.connections, args.duration)))
+        return 0
+    for name in args.server or sorted(SERVERS, reverse=True):
+        benchmark_server(name, args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
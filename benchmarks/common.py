@@ -0,0 +1,65 @@
+"""
+Helpers shared by the benchmarks.
+
+Etch's modules are imported flat from a site directory, so each benchmark
+copies the sample site to a temporary directory, adds its own content there
+and imports the modules from the copy, leaving the repo untouched.
+"""
+import atexit
+import logging
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+import time
+
+SITE = Path(__file__).resolve().parent.parent / 'etch'
+
+
+def enter_temp_site(bare=False):
+    """
+    Copy the sample site to a temporary directory and switch into it.
+
+    Args:
+        bare (bool): Leave out the sample posts, pages and projects
+
+    Returns:
+        Path: The temporary site directory
+    """
+    site = Path(tempfile.mkdtemp(prefix='etch-bench-'))
+    atexit.register(remove_site, site)
+    ignore = ['__pycache__', '.etch-cache', 'build']
+    shutil.copytree(SITE, site, dirs_exist_ok=True, ignore=shutil.ignore_patterns(*ignore))
+    if bare:
+        for name in ('posts', 'pages', 'projects'):
+            shutil.rmtree(site / name)
+            (site / name).mkdir()
+    os.chdir(site)
+    sys.path.insert(0, str(site))
+    # Cache misses are logged at INFO, once per file
+    logging.disable(logging.INFO)
+    return site
+
+
+def remove_site(site):
+    """Delete a temporary site, once the app's watcher can no longer write to it"""
+    app = sys.modules.get('app')
+    watcher = getattr(app, 'content_watcher', None)
+    if watcher is not None:
+        watcher.stop()
+        watcher.join(timeout=5)
+    shutil.rmtree(site, ignore_errors=True)
+
+
+def per_call(fn, number):
+    """Run fn `number` times and return the mean seconds per call"""
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return (time.perf_counter() - start) / number
+
+
+def best_of(fn, number, repeat=5):
+    """The fastest mean seconds per call of `repeat` runs"""
+    return min(per_call(fn, number) for _ in range(repeat))
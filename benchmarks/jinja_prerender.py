@@ -0,0 +1,99 @@
+"""
+Benchmark: pre-rendering the Jinja in document bodies.
+
+Times utils.prerender() against the old approach, a new Environment and
+from_string() per document with code blocks masked by re.sub() and restored
+by one str.replace() per block, over a corpus of 1,000 posts with many fenced
+code blocks. One post in ten uses Jinja outside its code blocks; the rest
+only have Jinja-like text inside them, which both approaches leave alone.
+
+The shared environment is timed cold (first pass, compiling and writing
+bytecode), warm (compiled templates in memory) and from the bytecode cache
+alone (as after a restart).
+
+    python benchmarks/jinja_prerender.py [--posts 1000] [--blocks 30]
+"""
+import argparse
+from datetime import datetime
+import re
+import time
+
+from jinja2 import BaseLoader, Environment
+
+from common import enter_temp_site
+
+
+def old_prerender(md_raw, context):
+    """The pre-render as it was: a fresh Environment per document"""
+    code_blocks = {}
+
+    def mask_code_block(match):
+        key = f"[{{CODEBLOCK_{len(code_blocks)}}}]"
+        code_blocks[key] = match.group(0)
+        return key
+
+    masked_md = re.sub(r"(```.*?```|~~~.*?~~~)", mask_code_block, md_raw, flags=re.DOTALL)
+    rendered = Environment(loader=BaseLoader).from_string(masked_md).render(**context)
+    for key, block in code_blocks.items():
+        rendered = rendered.replace(key, block)
+    return rendered
+
+
+def corpus(posts, blocks):
+    """Build post bodies with `blocks` fenced code blocks each"""
+    documents = []
+    for d in range(posts):
+        parts = []
+        for b in range(blocks):
+            parts.append(f"Paragraph {b} of post {d}, with a few words of prose.\n")
+            parts.append(f"```python\ndef f{b}(x):\n"
+                         f"    return {{'a': x}}  # {{{{ not jinja }}}}\n```\n")
+        if d % 10 == 0:
+            parts.append("Copyright {{ now.year }}\n")
+        documents.append('\n'.join(parts).strip())
+    return documents
+
+
+def timed(fn, documents):
+    """Run fn over every document; returns (seconds, outputs)"""
+    start = time.perf_counter()
+    outputs = [fn(document) for document in documents]
+    return time.perf_counter() - start, outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--blocks', type=int, default=30, help="Fenced blocks per post")
+    args = parser.parse_args(argv)
+
+    site = enter_temp_site(bare=True)
+    import utils  # pylint: disable=import-outside-toplevel
+
+    documents = corpus(args.posts, args.blocks)
+    context = {'now': datetime.now()}
+
+    def new(document):
+        return utils.prerender(document, context)[0]
+
+    results = {}
+    results['old'], expected = timed(lambda document: old_prerender(document, context), documents)
+
+    # Jinja keeps 400 compiled templates in memory, so over a larger corpus
+    # the warm pass also loads some from the bytecode cache
+    utils.configure_jinja(str(site / '.etch-cache' / 'jinja'))
+    results['new, cold'], outputs = timed(new, documents)
+    assert outputs == expected
+    results['new, warm'], outputs = timed(new, documents)
+    assert outputs == expected
+    utils.jinja_env.cache.clear()
+    results['new, bytecode'], outputs = timed(new, documents)
+    assert outputs == expected
+
+    print(f"{args.posts} posts, {args.blocks} fenced blocks each")
+    for label, seconds in results.items():
+        print(f"{label:>14}: {seconds * 1000:8.1f} ms  {seconds / args.posts * 1e6:8.1f} us/post")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark: the navigation menu, scanned per render against precomputed.
+
+Builds a site with 200 pages, 20 of them in the menu, and times
+get_navigation_items() and a whole page request (with the response cache
+bypassed, as for a logged-in admin), using both the index's precomputed menu
+and the old approach of listing pages/ and loading every page per render.
+
+    python benchmarks/navigation.py [--pages 200]
+"""
+import argparse
+import os
+
+from common import best_of, enter_temp_site
+
+
+def write_pages(count, in_nav_every=10):
+    """Write `count` pages, every `in_nav_every`th of them shown in the menu"""
+    for i in range(count):
+        with open(os.path.join('pages', f"page-{i:04d}.md"), 'w', encoding='utf-8') as f:
+            f.write(f"---\ntitle: Page {i}\ndescription: Benchmark page {i}\n"
+                    f"show_in_nav: {str(i % in_nav_every == 0).lower()}\nnav_order: {i}\n---\n\n"
+                    f"# Page {i}\n\n" + "Some text for the page body. " * 50 + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    enter_temp_site()
+    write_pages(args.pages)
+    # Imported only now, so the index is built over the pages just written
+    import app as etch_app  # pylint: disable=import-outside-toplevel
+    from utils import PageMetadata, load_markdown_file  # pylint: disable=import-outside-toplevel
+
+    def scanned_navigation():
+        """The menu as it was built before it was precomputed: on every render"""
+        pages_dir = etch_app.config['paths']['pages']
+        nav_items = []
+        for filename in os.listdir(pages_dir):
+            if filename.endswith('.md'):
+                metadata, _ = load_markdown_file(os.path.join(pages_dir, filename))
+                if isinstance(metadata, PageMetadata) and metadata.show_in_nav:
+                    nav_items.append({
+                        'slug': '-'.join(filename.split('.')[:-1]),
+                        'title': metadata.title,
+                        'description': metadata.description,
+                        'order': metadata.nav_order,
+                        'icon': metadata.nav_icon,
+                    })
+        nav_items.sort(key=lambda x: x['order'])
+        return nav_items
+
+    assert scanned_navigation() == etch_app.get_navigation_items()
+
+    client = etch_app.app.test_client()
+    # A logged-in admin skips the response cache, so every request renders
+    with client.session_transaction() as session:
+        session['authenticated'] = True
+
+    def request():
+        response = client.get('/page-0001')
+        assert response.status_code == 200, response.status_code
+
+    globals_ = etch_app.app.jinja_env.globals
+    results = {}
+    for label, navigation in (('scanned', scanned_navigation),
+                              ('precomputed', etch_app.get_navigation_items)):
+        globals_['get_navigation'] = navigation
+        results[label] = (best_of(navigation, 200), best_of(request, 100))
+    globals_['get_navigation'] = etch_app.get_navigation_items
+
+    print(f"{args.pages} pages")
+    print(f"{'':>12}  {'menu (us)':>10}  {'request (ms)':>12}")
+    for label, (menu, request_time) in results.items():
+        print(f"{label:>12}  {menu * 1e6:10.1f}  {request_time * 1e3:12.2f}")
+
+
+if __name__ == '__main__':
+    main()
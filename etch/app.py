@@ -10,74 +10,241 @@ from datetime import (
     timezone,
 )
 from functools import wraps
+import hashlib
+import json
+import math
 import os
 from pathlib import Path
-import random
 import re
 import secrets
 import shutil
-import time
+import threading
 from urllib.parse import urljoin
+from xml.sax.saxutils import escape as xml_escape
 
-from rfeed import Feed, Guid, Item
 from flask import (
     Flask,
     Response,
+    make_response,
     render_template,
+    send_from_directory,
     session,
     request,
     redirect,
     url_for,
     jsonify,
 )
+from werkzeug.middleware.proxy_fix import ProxyFix
 import yaml
 
-from auth import verify_admin_password
+from assets import assets
+from auth import LoginThrottle, VerifierBusy, verifier, verify_admin_password
+from cache import ResponseCache
+from compression import (
+    ENCODINGS,
+    choose_encoding,
+    compress_stream,
+    is_compressible,
+    precompress_static,
+    precompressed_sibling,
+    variants,
+)
+from feeds import atom_feed, build_items, json_feed, rss_feed
+from search import SearchIndex, html_to_text
 from utils import (
     CONTENT_TYPES,
     ContentType,
-    PageMetadata,
     calculate_reading_time,
-    get_content_listing,
+    configure_jinja,
+    content_index,
+    digest_files,
+    disk_cache,
+    dynamic_window,
     load_config,
+    load_document,
     load_markdown_file,
-    md,
+    render_cache,
+    render_fingerprint,
+    naive_utc,
+    render_markdown,
+    summarizer,
+    warm_content,
 )
+from vendor import vendor_urls, vendored_names
+from watcher import start_watcher
 
-# Load configuration
+# Load configuration. This copy is read once, at import: only auth.py's
+# credentials and Argon2 costs follow later edits to config.yml
 config = load_config()
 app = Flask(__name__,
             template_folder=config['paths']['templates'],
             static_folder=config['paths']['static'])
 
 app.secret_key = os.getenv('SECRET_KEY', os.urandom(24))
+# Behind a reverse proxy, take the client address (which login throttling is
+# keyed on), host and scheme from the X-Forwarded-* headers it sets. Each
+# `proxy` setting is the number of trusted proxies that set that header.
+app.wsgi_app = ProxyFix(app.wsgi_app, **config.get('proxy', {}))
+login_throttle = LoginThrottle(**config['admin'].get('login_throttle', {}))
+verifier.configure(**config['admin'].get('verify', {}))
+
+render_cache.configure(**config.get('cache', {}).get('render', {}))
+assets.configure(config['paths']['static'], **config.get('assets', {}))
+# `etch warm` and `etch build` hash the static files; workers only read the
+# manifest, unless there isn't one yet
+if not assets.load():
+    assets.build()
+disk_cache.configure(**config.get('cache', {}).get('disk', {}))
+configure_jinja(**config.get('cache', {}).get('jinja', {}))
+summarizer.configure(config['content']['summary_length'])
+
+# Render everything in parallel before serving, so the index build below
+# and the first visitors hit a warm cache
+warm_config = config.get('cache', {}).get('warm', {})
+if warm_config.get('on_start', False):
+    warm_timings, warm_total = warm_content(config['paths'], warm_config.get('workers'))
+    for warm_path, warm_seconds in sorted(warm_timings.items()):
+        app.logger.info("Warmed %s in %.1f ms", warm_path, warm_seconds * 1000)
+    app.logger.info("Warmed %d files in %.2f s", len(warm_timings), warm_total)
+    precompress_static(config['paths']['static'])
+
+# Index all content once at startup; listing routes read from memory
+with app.app_context():
+    content_index.build(config['paths'])
+
+
+def refresh_content(filepath):
+    """Re-index a file reported as created, modified or deleted by the watcher."""
+    with app.app_context():
+        content_index.refresh(filepath)
+
+
+# Whole responses for anonymous visitors, dropped when content they use changes
+response_cache = ResponseCache(sizeof=lambda cached: len(cached[0]) + sum(
+                                   len(data) for data in cached[4].values()),
+                               expires=lambda cached: cached[3],
+                               **config.get('cache', {}).get('response', {}))
+
+
+def invalidate_responses(name, slug):
+    """Drop cached responses that depend on a changed content file."""
+    response_cache.invalidate_tags({name, f"{name}/{slug}"})
+
+
+content_index.subscribe(invalidate_responses)
+
+# Full-text search over every indexed file, saved to disk between restarts
+search_config = config.get('search', {})
+search_index = SearchIndex()
+
+
+# The index is synced on the first search rather than at import, so workers
+# that never serve one never render every file for it
+search_synced = threading.Event()
+_search_syncing = threading.Event()
+_search_sync_lock = threading.Lock()
+# Changed files wait here, to be re-indexed and saved in one batch off the
+# watcher thread, `search.save_delay` seconds after the first change
+_search_pending = set()
+_search_pending_lock = threading.Lock()
+
+
+def index_for_search(name, slug):
+    """
+    Add, replace or drop a content file in the search index.
+
+    Returns:
+        bool: Whether the search index changed
+    """
+    doc_id = f"{name}/{slug}"
+    entry = content_index.get(name, slug)
+    if entry is None:
+        if doc_id not in search_index:
+            return False
+        search_index.remove(doc_id)
+        return True
+    if search_index.fingerprints().get(doc_id) == entry.digest:
+        return False
+    _, content = load_markdown_file(entry.path)
+    search_index.add(doc_id, entry.digest,
+                     title=getattr(entry.metadata, 'title', ''),
+                     description=getattr(entry.metadata, 'description', ''),
+                     text=html_to_text(content))
+    return True
+
+
+def update_search(name, slug):
+    """Queue a changed content file to be re-indexed."""
+    if not _search_syncing.is_set():
+        return  # Syncing compares every file's digest anyway
+    with _search_pending_lock:
+        first = not _search_pending
+        _search_pending.add((name, slug))
+    if first:
+        timer = threading.Timer(search_config.get('save_delay', 2.0), flush_search_updates)
+        timer.daemon = True
+        timer.start()
+
+
+def flush_search_updates():
+    """Re-index the queued files and save the search index once."""
+    with _search_pending_lock:
+        pending = list(_search_pending)
+        _search_pending.clear()
+    with app.app_context():
+        changed = [index_for_search(name, slug) for name, slug in pending]
+    if any(changed) and search_config.get('path'):
+        search_index.save(search_config['path'])
+
+
+def sync_search_index():
+    """Load the saved search index and re-index only files that changed since."""
+    path = search_config.get('path')
+    fingerprint = render_fingerprint()
+    if path and search_index.load(path, fingerprint):
+        app.logger.info("Loaded search index with %d documents", len(search_index))
+    search_index.fingerprint = fingerprint
+
+    current = {f"{name}/{entry.slug}": (name, entry)
+               for name in CONTENT_TYPES for entry in content_index.entries(name)}
+    stale = search_index.fingerprints().keys() - current.keys()
+    for doc_id in stale:
+        search_index.remove(doc_id)
+    changed = [index_for_search(name, entry.slug) for name, entry in current.values()]
+    if path and (stale or any(changed)):
+        search_index.save(path)
+
+
+def ensure_search_index():
+    """Sync the search index if this worker hasn't yet."""
+    if search_synced.is_set():
+        return
+    with _search_sync_lock:
+        if not search_synced.is_set():
+            # Changes made while syncing are queued, not lost
+            _search_syncing.set()
+            sync_search_index()
+            search_synced.set()
+
+
+content_index.subscribe(update_search)
+
+
+def stop_watching():
+    """Stop trusting the index for file mtimes once nothing watches the files."""
+    content_index.watching = False
+
+
+content_watcher = start_watcher(content_index.directories(), refresh_content,
+                                on_exit=stop_watching,
+                                **config.get('cache', {}).get('watch', {}))
+content_index.watching = content_watcher is not None and content_watcher.is_alive()
 
 
 def get_navigation_items():
     """Get sorted list of pages that should appear in navigation."""
-    pages_dir = config['paths']['pages']
-    nav_items = []
-
-    if not os.path.exists(pages_dir):
-        return nav_items
-
-    for filename in os.listdir(pages_dir):
-        if filename.endswith('.md'):
-            metadata, _ = load_markdown_file(os.path.join(pages_dir, filename))
-
-            if isinstance(metadata, PageMetadata) and metadata.show_in_nav:
-                item = {
-                    'slug': '-'.join(filename.split('.')[:-1]),
-                    'title': metadata.title,
-                    'description': metadata.description,
-                    'order': metadata.nav_order,
-                    'icon': metadata.nav_icon,
-                }
-                nav_items.append(item)
-
-    # Sort by nav_order
-    nav_items.sort(key=lambda x: x['order'])
-    return nav_items
+    # Precomputed by the content index and rebuilt only when a page changes
+    return content_index.navigation()
 
 
 app.jinja_env.globals.update(
@@ -104,6 +271,193 @@ def requires_auth(f):
     return decorated
 
 
+# Everything besides content that shapes a rendered response; changes per deploy
+layout_fingerprint = hashlib.sha256((
+    digest_files(p for p in Path(config['paths']['templates']).rglob('*') if p.is_file())
+    + render_fingerprint()
+    + json.dumps(assets.files, sort_keys=True)
+).encode('utf-8')).hexdigest()
+
+
+def conditional(validators):
+    """
+    Decorator adding strong ETag and Last-Modified headers to a content view.
+
+    `validators` receives the view's arguments and returns the content digests
+    the response is built from and their newest mtime, or None to skip. A
+    client whose copy is still current gets a 304 before the view is run.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            found = validators(**kwargs)
+            if found is None:
+                return f(*args, **kwargs)
+
+            etag, last_modified, is_current = check_validators(*found)
+            response = Response(status=304) if is_current else make_response(f(*args, **kwargs))
+            if response.status_code in (200, 304):
+                response.set_etag(etag)
+                response.last_modified = last_modified
+            return response
+
+        decorated.validators = validators
+        return decorated
+
+    return decorator
+
+
+def check_validators(digests, mtime):
+    """
+    Compare the current request's conditional headers with a view's validators.
+
+    Returns:
+        tuple: (etag, last_modified, whether the client's copy is current)
+    """
+    # The footer shows the current year, so it is part of every page
+    etag = hashlib.sha256('\0'.join(
+        (layout_fingerprint, str(datetime.utcnow().year)) + tuple(digests)
+    ).encode('utf-8')).hexdigest()
+    last_modified = datetime.fromtimestamp(int(mtime), tz=timezone.utc)
+
+    if request.if_none_match:
+        is_current = request.if_none_match.contains(etag)
+    elif request.if_modified_since:
+        is_current = last_modified <= request.if_modified_since
+    else:
+        is_current = False
+    return etag, last_modified, is_current
+
+
+def cached_response(tags, expires=None):
+    """
+    Decorator caching a view's whole response for anonymous GET requests.
+
+    `tags` receives the view's arguments and returns the content the response
+    depends on: a content type name (e.g. 'posts') for anything listing it, or
+    'posts/<slug>' for a single file. Admin sessions always bypass the cache.
+    Entries are also keyed by date, as pages show the date in some form.
+    `expires`, if given, receives the same arguments and returns a timestamp
+    after which the response is stale, or None. Text bodies are stored with
+    gzip (and Brotli) variants alongside, made once when the entry is stored
+    and picked by Accept-Encoding. Without a watcher, the files named by
+    'type/slug' tags are checked first, so an edit drops their responses.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method != 'GET' or 'authenticated' in session:
+                return f(*args, **kwargs)
+            if not content_index.watching:
+                for tag in tags(**kwargs):
+                    name, _, slug = tag.partition('/')
+                    if slug:
+                        content_index.current(name, slug)
+
+            key = f"{request.host}{request.full_path}"
+            today = datetime.utcnow().date()
+            cached = cached_copy(key, today)
+            if cached is not None:
+                return cached
+
+            generation = response_cache.generation
+            response = make_response(f(*args, **kwargs))
+            if (response.status_code == 200 and not response.direct_passthrough
+                    and 'Set-Cookie' not in response.headers):
+                body = response.get_data()
+                cached = (body, response.status_code, list(response.headers),
+                          expires(**kwargs) if expires else None,
+                          variants(body, response.mimetype))
+                response_cache.put(key, today, cached, tags=tags(**kwargs),
+                                   generation=generation)
+                return cached_to_response(cached)
+            return response
+
+        decorated.response_cached = True
+        return decorated
+
+    return decorator
+
+
+def cached_copy(key, today):
+    """Build a response from the response cache, or None on a miss."""
+    cached = response_cache.get(key, today)
+    return cached_to_response(cached) if cached is not None else None
+
+
+def cached_to_response(cached):
+    """Build a response from a cache entry, compressed if the client accepts it."""
+    body, status, headers, _, compressed = cached
+    encoding = choose_encoding(request.accept_encodings, list(compressed))
+    response = Response(compressed[encoding] if encoding else body,
+                        status=status, headers=headers)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+        response.content_length = len(compressed[encoding])
+    if compressed:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def serve_from_cache():
+    """
+    Answer the current request from memory alone, or return None.
+
+    Only anonymous GETs of views using cached_response are answered, with a
+    304 when the client's copy is current or the cached response otherwise.
+    Nothing here touches the disk or renders, so the ASGI front end calls it
+    on its event loop and leaves everything else to the full app. Without a
+    watcher, validators check files on disk, so nothing is answered here.
+    """
+    if request.method != 'GET' or request.url_rule is None or 'authenticated' in session:
+        return None
+    if not content_index.watching:
+        return None
+    view = app.view_functions.get(request.url_rule.endpoint)
+    if not getattr(view, 'response_cached', False):
+        return None
+
+    found = view.validators(**request.view_args) if hasattr(view, 'validators') else None
+    if found is None:
+        return cached_copy(f"{request.host}{request.full_path}", datetime.utcnow().date())
+
+    etag, last_modified, is_current = check_validators(*found)
+    if is_current:
+        response = Response(status=304)
+    else:
+        response = cached_copy(f"{request.host}{request.full_path}", datetime.utcnow().date())
+        if response is None:
+            return None
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
+
+def entry_validators(name, slug):
+    """Validators for a single content file rendered inside the site layout."""
+    # Without a watcher, the file is checked so an edit changes the ETag
+    entry = content_index.current(name, slug)
+    if entry is None:
+        return None
+    # The navigation menu is built from pages, so every page depends on them
+    digests = (entry.digest, content_index.digest('pages'))
+    mtime = max(entry.mtime, content_index.last_modified('pages'))
+    if entry.dynamic:
+        # Dynamic documents are re-rendered once per window
+        start, _ = dynamic_window()
+        digests += (str(start),)
+        mtime = max(mtime, start)
+    return digests, mtime
+
+
+def entry_expiry(name, slug):
+    """When a content file's cached response goes stale, or None if it doesn't."""
+    entry = content_index.current(name, slug)
+    if entry is None or not entry.dynamic:
+        return None
+    return dynamic_window()[1]
+
+
 def get_content_items(content_type: ContentType):
     """Get and sort content items for a given content type."""
     directory = os.path.join(config['paths'][content_type.name])
@@ -115,117 +469,239 @@ def get_content_items(content_type: ContentType):
             if metadata:
                 items.append((metadata, content))
     sort_key = content_type.sort_key
-    return sorted(items, key=lambda x: getattr(x[0], sort_key, ""),
+    return sorted(items, key=lambda x: naive_utc(getattr(x[0], sort_key, "")),
                   reverse=content_type.reverse)
 
 
 # Routes
+def post_cursor(entry):
+    """Encode a post's position in the date-sorted listing as a keyset cursor."""
+    value, slug = content_index.sort_key('posts', entry)
+    return f"{value.isoformat()},{slug}"
+
+
+def parse_post_cursor(cursor):
+    """Decode a `<date>,<slug>` cursor into a post sort key; raises ValueError."""
+    value, separator, slug = cursor.partition(',')
+    if not separator or not slug:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    # Sort keys are naive UTC, so an offset in the cursor is converted to match
+    try:
+        return naive_utc(datetime.fromisoformat(value)), slug
+    except OverflowError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+# Query parameters of /api/posts that filter by a facet, and the field each indexes
+POST_FILTERS = {'tag': 'tags', 'category': 'category', 'status': 'status'}
+
+
+def post_filter(args):
+    """Get the (field, value) facet a post listing request filters on, if any."""
+    filters = [(field, args[param]) for param, field in POST_FILTERS.items() if param in args]
+    if len(filters) > 1:
+        raise ValueError("Only one of tag, category or status may be given")
+    return filters[0] if filters else None
+
+
+def render_post_listing(heading, facet, query):
+    """Render the first page of posts for a facet, with load-more for the rest."""
+    posts = content_index.page('posts', 0, config['content']['posts_per_page'], facet=facet)
+    if not posts:
+        return render_template('errors/404.html'), 404
+    return render_template(
+        'listing.html',
+        heading=heading,
+        posts=posts,
+        n_posts=content_index.count('posts', facet=facet),
+        next_cursor=post_cursor(posts[-1]),
+        query=query,
+    )
+
+
 @app.route('/')
+@cached_response(lambda: {'posts', 'pages'})
 def index():
     """Display the homepage with recent posts."""
-    # Get most recent posts
-    posts = []
-    posts_dir = config['paths']['posts']
-    for filename in os.listdir(posts_dir):
-        if filename.endswith('.md'):
-            metadata, content = load_markdown_file(os.path.join(posts_dir, filename))
-            if hasattr(metadata, 'date'):
-                summary_length = config['content']['summary_length']
-                summary = (content[:summary_length] + '...'
-                           if len(content) > summary_length else content)
-                posts.append({
-                    'slug': filename[:-3],
-                    'metadata': metadata,
-                    'summary': summary
-                })
-
-    # Sort posts by date
-    posts.sort(key=lambda x: x['metadata'].date, reverse=True)
+    # Posts are kept sorted by date, newest first, so this is just a slice
+    posts = content_index.page('posts', 0, config['content']['posts_per_page'])
     return render_template(
         'index.html',
-        posts=posts[:config['content']['posts_per_page']],
-        n_posts=len(posts),
+        posts=posts,
+        n_posts=content_index.count('posts'),
+        next_cursor=post_cursor(posts[-1]) if posts else '',
     )
 
 
 @app.route('/api/posts')
+@cached_response(lambda: {'posts'})
 def get_posts():
-    """API endpoint to get paginated posts."""
-    page_num = request.args.get('page', 1, type=int)
+    """
+    API endpoint to get paginated posts.
+
+    Pages can be requested by number (?page=2) or, for stable infinite
+    scrolling, by keyset cursor (?after=<date>,<slug>) taken from the previous
+    response's next_cursor. Posts can be filtered by one of ?tag=, ?category=
+    or ?status=.
+    """
+    try:
+        facet = post_filter(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
     per_page = config['content']['posts_per_page']
+    total_posts = content_index.count('posts', facet=facet)
+    total_pages = (total_posts + per_page - 1) // per_page
 
-    # Get all posts
-    posts = []
-    posts_dir = config['paths']['posts']
+    after = request.args.get('after')
+    if after:
+        try:
+            key = parse_post_cursor(after)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+
+        # Fetch one extra post to find out whether there is another page
+        posts = content_index.page_after('posts', key, per_page + 1, facet=facet)
+        has_next = len(posts) > per_page
+        posts = posts[:per_page]
+        pagination = {
+            'total_posts': total_posts,
+            'total_pages': total_pages,
+            'has_next': has_next,
+        }
+    else:
+        page_num = request.args.get('page', 1, type=int)
+        start = (page_num - 1) * per_page
+        posts = content_index.page('posts', start, start + per_page, facet=facet)
+        has_next = page_num < total_pages
+        pagination = {
+            'current_page': page_num,
+            'total_posts': total_posts,
+            'total_pages': total_pages,
+            'has_next': has_next,
+            'has_prev': page_num > 1
+        }
+    pagination['next_cursor'] = post_cursor(posts[-1]) if posts and has_next else None
+
+    current_posts = []
+    for entry in posts:
+        post_data = {
+            'slug': entry.slug,
+            'title': entry.metadata.title,
+            'date': entry.metadata.date.isoformat(),
+            'description': getattr(entry.metadata, 'description', ''),
+        }
 
-    for filename in os.listdir(posts_dir):
-        if filename.endswith('.md'):
-            metadata, content = load_markdown_file(os.path.join(posts_dir, filename))
-            if hasattr(metadata, 'date'):
-                post_data = {
-                    'slug': filename[:-3],
-                    'title': metadata.title,
-                    'date': metadata.date.isoformat(),
-                    'description': getattr(metadata, 'description', ''),
-                }
-
-                # Add summary if no description
-                if not post_data['description']:
-                    summary_length = config['content']['summary_length']
-                    post_data['summary'] = (content[:summary_length] + '...'
-                                            if len(content) > summary_length else content)
-
-                posts.append(post_data)
-
-    # Sort posts by date
-    posts.sort(key=lambda x: x['date'], reverse=True)
-
-    # Calculate pagination
-    total_posts = len(posts)
-    total_pages = (total_posts + per_page - 1) // per_page
-    start = (page_num - 1) * per_page
-    end = start + per_page
+        # Add summary if no description
+        if not post_data['description']:
+            post_data['summary'] = entry.summary
 
-    current_posts = posts[start:end]
+        current_posts.append(post_data)
 
     # Debug logging
-    app.logger.debug("Page: %s, Total: %s, Per page: %s",
-                     page_num, total_posts, per_page)
+    app.logger.debug("Cursor: %s, Total: %s, Per page: %s",
+                     after or request.args.get('page'), total_posts, per_page)
     app.logger.debug("Returning %s posts", len(current_posts))
 
     return jsonify({
         'posts': current_posts,
-        'pagination': {
-            'current_page': page_num,
-            'total_pages': total_pages,
-            'has_next': page_num < total_pages,
-            'has_prev': page_num > 1
-        }
+        'pagination': pagination,
+    })
+
+
+@app.route('/api/tags')
+@cached_response(lambda: {'posts', 'projects'})
+def get_tags():
+    """API endpoint listing each tag, category, status and technology with its count."""
+    return jsonify({
+        'tags': content_index.facet_counts('posts', 'tags'),
+        'categories': content_index.facet_counts('posts', 'category'),
+        'statuses': content_index.facet_counts('posts', 'status'),
+        'technologies': content_index.facet_counts('projects', 'technologies'),
     })
 
 
+# Endpoint and slug argument of each content type's page, for search results
+# and the sitemap
+SEARCH_ENDPOINTS = {'posts': ('post', 'slug'), 'pages': ('page', 'page'),
+                    'projects': ('project', 'slug')}
+
+
+@app.route('/api/search')
+def search_content():
+    """
+    API endpoint for full-text search over posts, pages and projects.
+
+    Results are ranked by BM25, the last word of ?q= is matched as a prefix,
+    and each result carries an HTML snippet with the matches in <mark>.
+    """
+    ensure_search_index()
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int),
+                       search_config.get('max_results', 20)))
+
+    results = []
+    for doc_id, score, terms in search_index.search(query, limit):
+        doc = search_index.document(doc_id)
+        if doc is None:
+            continue
+        name, slug = doc_id.split('/', 1)
+        endpoint, arg = SEARCH_ENDPOINTS[name]
+        results.append({
+            'type': name,
+            'slug': slug,
+            'title': doc.title,
+            'url': url_for(endpoint, **{arg: slug}),
+            'score': round(score, 4),
+            'snippet': search_index.snippet(doc_id, terms),
+        })
+
+    return jsonify({'query': query, 'results': results})
+
+
+@app.route('/tags/<tag>')
+@cached_response(lambda tag: {'posts', 'pages'})
+def tag(tag):
+    """Display the posts with a tag."""
+    return render_post_listing(f'Posts tagged "{tag}"', ('tags', tag), {'tag': tag})
+
+
+@app.route('/category/<name>')
+@cached_response(lambda name: {'posts', 'pages'})
+def category(name):
+    """Display the posts in a category."""
+    return render_post_listing(f"Posts in {name}", ('category', name), {'category': name})
+
+
 @app.route('/<page>')
+@conditional(lambda page: entry_validators('pages', page))
+@cached_response(lambda page: {'pages'}, lambda page: entry_expiry('pages', page))
 def page(page):
     """Display a static page."""
-    metadata, content = load_markdown_file(
+    metadata, content, features = load_document(
         os.path.join(config['paths']['pages'], f"{page}.md"))
     if content is None:
         return "Page not found", 404
 
     # Pass metadata as the page variable that the template expects
-    return render_template('page.html', content=content, page=metadata)
+    return render_template('page.html', content=content, page=metadata, features=features)
 
 
 @app.route('/posts/<slug>')
+@conditional(lambda slug: entry_validators('posts', slug))
+@cached_response(lambda slug: {f'posts/{slug}', 'pages'},
+                 lambda slug: entry_expiry('posts', slug))
 def post(slug):
     """Display a blog post."""
     filepath = os.path.join(config['paths']['posts'], f"{slug}.md")
-    metadata, content = load_markdown_file(filepath)
+    metadata, content, features = load_document(filepath)
     if content is None:
         return "Post not found", 404
 
-    # Calculate reading time
-    reading_time = calculate_reading_time(content)
+    # Calculate reading time from the word count taken at render time
+    entry = content_index.get('posts', slug)
+    reading_time = (calculate_reading_time(word_count=entry.word_count) if entry
+                    else calculate_reading_time(content))
 
     # Add reading_time to metadata if it's an object that allows it,
     # otherwise pass it separately
@@ -236,50 +712,42 @@ def post(slug):
         'post.html',
         post=metadata,
         content=content,
+        features=features,
     )
 
 
 @app.route('/projects/<slug>')
+@conditional(lambda slug: entry_validators('projects', slug))
+@cached_response(lambda slug: {f'projects/{slug}', 'pages'},
+                 lambda slug: entry_expiry('projects', slug))
 def project(slug):
     """Display a project page."""
     filepath = os.path.join(config['paths']['projects'], f"{slug}.md")
-    metadata, content = load_markdown_file(filepath)
+    metadata, content, features = load_document(filepath)
     if content is None:
         return "Post not found", 404
 
     return render_template(
         'project.html',
         project=metadata,
-        content=content
+        content=content,
+        features=features,
     )
 
 
 @app.route('/projects')
+@cached_response(lambda: {'projects', 'pages'})
 def projects():
-    """Display the projects listing page."""
-    projects_dir = config['paths']['projects']
-    if not os.path.exists(projects_dir):
-        return render_template('projects.html', projects=[])
-
-    # Use the existing get_content_listing function
-    project_files = get_content_listing(projects_dir)
-
-    # Add summaries to the projects
-    for project_item in project_files:
-        _, content = load_markdown_file(
-            os.path.join(projects_dir, f"{project_item['slug']}.md"))
-        summary_length = config['content']['summary_length']
-        project_item['summary'] = (content[:summary_length] + '...'
-                                   if content and len(content) > summary_length
-                                   else content)
-
-    # Sort projects by date_started (newest first)
-    project_files.sort(
-        key=lambda x: getattr(x['metadata'], 'date_started', datetime.now()),
-        reverse=True
-    )
-
-    return render_template('projects.html', projects=project_files)
+    """Display the projects listing page, optionally filtered by ?technology=."""
+    technology = request.args.get('technology')
+    if technology:
+        facet = ('technologies', technology)
+        items = content_index.page('projects', 0, content_index.count('projects', facet=facet),
+                                   facet=facet)
+    else:
+        # Entries are pre-sorted by date_started, newest first
+        items = content_index.entries('projects')
+    return render_template('projects.html', projects=items)
 
 
 # Admin routes
@@ -294,9 +762,26 @@ def admin():
 def login():
     """Handle admin login."""
     if request.method == 'POST':
+        client = request.remote_addr
+        retry_after = login_throttle.retry_after(client)
+        if retry_after:
+            # Refuse straight away rather than sleeping, so throttled clients
+            # don't hold up a worker
+            response = make_response("Too many failed attempts", 429)
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
+
         password = request.form.get('password', '')
 
-        if verify_admin_password(password):
+        try:
+            valid = verify_admin_password(password)
+        except VerifierBusy:
+            response = make_response("Too many logins in progress", 503)
+            response.headers['Retry-After'] = '1'
+            return response
+
+        if valid:
+            login_throttle.success(client)
             session['authenticated'] = True
             session['auth_time'] = datetime.now().isoformat()
 
@@ -305,64 +790,82 @@ def login():
 
             return redirect(url_for('admin'))
 
-        # Add small delay to prevent timing attacks
-        time.sleep(random.uniform(0.1, 0.3))
+        login_throttle.failure(client)
         return "Invalid password", 401
 
     return render_template('admin/login.html')
 
 
+# Feed items for the current posts, rebuilt only when a post changes
+_feed_items = {}
+
+
+def feed_items():
+    """Get the feed items shared by every feed format, built once per posts digest."""
+    feed_config = config.get('feed', {})
+    digest = content_index.digest('posts')
+    items = _feed_items.get(digest)
+    if items is None:
+        load_content = None
+        if feed_config.get('full_content', False):
+            def load_content(entry):
+                return load_markdown_file(entry.path)[1]
+        items = build_items(content_index.entries('posts'),
+                            limit=feed_config.get('limit', 20),
+                            default_author=config.get('site', {}).get('author', ''),
+                            load_content=load_content)
+        _feed_items.clear()
+        _feed_items[digest] = items
+    return items
+
+
+def feed_updated():
+    """When the posts last changed, as the feeds' build date."""
+    return datetime.fromtimestamp(content_index.last_modified('posts'), tz=timezone.utc)
+
+
+def feed_validators():
+    """Validators shared by the feeds, which depend on the posts and the host."""
+    return ((content_index.digest('posts'), request.url_root),
+            content_index.last_modified('posts'))
+
+
+def site_url():
+    """The site's absolute URL, without a trailing slash."""
+    return config.get('site', {}).get('url', request.url_root.rstrip('/'))
+
+
 @app.route('/rss.xml')
+@conditional(feed_validators)
+@cached_response(lambda: {'posts'})
 def rss():
     """Generate RSS feed for blog posts."""
-    # Get all posts
-    posts = []
-    posts_dir = config['paths']['posts']
+    xml = rss_feed(feed_items(), config.get('site', {}), site_url(), feed_updated())
+    return xml, 200, {'Content-Type': 'application/rss+xml; charset=utf-8'}
 
-    site_url = config.get('site', {}).get('url', request.url_root.rstrip('/'))
 
-    for filename in os.listdir(posts_dir):
-        if filename.endswith('.md'):
-            metadata, content = load_markdown_file(os.path.join(posts_dir, filename))
-            if hasattr(metadata, 'date'):
-                # Convert content to HTML if it's not already
-                if not content.startswith('<'):
-                    md.reset()
-                    content = md.convert(content)
-
-                description = (getattr(metadata, 'description', '') or
-                               content[:config['content']['summary_length']])
-                author = (getattr(metadata, 'author', '') or
-                          config.get('site', {}).get('author', ''))
-
-                # Create post item
-                posts.append(Item(
-                    title=metadata.title,
-                    link=f"{site_url}/posts/{filename[:-3]}",
-                    description=description,
-                    author=author,
-                    guid=Guid(f"{site_url}/posts/{filename[:-3]}"),
-                    pubDate=datetime.combine(metadata.date, datetime.min.time()).replace(
-                        tzinfo=timezone.utc)
-                ))
-
-    # Sort posts by date
-    posts.sort(key=lambda x: x.pubDate, reverse=True)
-
-    # Create the feed
-    feed = Feed(
-        title=config.get('site', {}).get('title', 'Blog'),
-        link=site_url,
-        description=config.get('site', {}).get('description', 'Recent blog posts'),
-        language=config.get('site', {}).get('language', 'en-US'),
-        lastBuildDate=datetime.now(timezone.utc),
-        items=posts
-    )
+@app.route('/atom.xml')
+@conditional(feed_validators)
+@cached_response(lambda: {'posts'})
+def atom():
+    """Generate Atom feed for blog posts."""
+    xml = atom_feed(feed_items(), config.get('site', {}), site_url(),
+                    site_url() + url_for('atom'), feed_updated())
+    return xml, 200, {'Content-Type': 'application/atom+xml; charset=utf-8'}
 
-    return feed.rss(), 200, {'Content-Type': 'application/rss+xml; charset=utf-8'}
+
+@app.route('/feed.json')
+@conditional(feed_validators)
+@cached_response(lambda: {'posts'})
+def json_feed_view():
+    """Generate JSON Feed for blog posts."""
+    body = json_feed(feed_items(), config.get('site', {}), site_url(),
+                     site_url() + url_for('json_feed_view'))
+    return body, 200, {'Content-Type': 'application/feed+json; charset=utf-8'}
 
 
 @app.route("/robots.txt")
+@cached_response(lambda: set())
 def robots_txt():
     """Generate robots.txt file."""
     lines = [
@@ -374,52 +877,177 @@ def robots_txt():
     return Response("\n".join(lines), mimetype="text/plain")
 
 
-@app.route("/sitemap.xml")
-def sitemap_xml():
-    """Generate sitemap.xml file."""
-    urls = []
+def sitemap_validators(number=None):
+    """Validators for the sitemaps, which list all content and today's date."""
+    today = datetime.utcnow().date()
+    start_of_today = datetime.combine(today, datetime.min.time(), tzinfo=timezone.utc)
+    digests = [content_index.digest(name) for name in CONTENT_TYPES]
+    mtimes = [content_index.last_modified(name) for name in CONTENT_TYPES]
+    return ((*digests, request.host_url, today.isoformat(), str(number)),
+            max(mtimes + [start_of_today.timestamp()]))
+
+
+# The sitemap protocol's limit on URLs per file
+SITEMAP_MAX_URLS = 50000
+
+# (path, lastmod) of every sitemap URL, rebuilt only when content changes
+_sitemap_urls = {}
+
+
+def sitemap_urls():
+    """Get the (path, lastmod) of each URL in the sitemap, homepage first."""
+    digests = tuple(content_index.digest(name) for name in CONTENT_TYPES)
+    urls = _sitemap_urls.get(digests)
+    if urls is None:
+        urls = []
+        # Paths only, built the same for every request (and for `etch build`,
+        # outside one); the sitemap joins them onto the request's host URL
+        adapter = app.url_map.bind('')
+        for name in CONTENT_TYPES:
+            endpoint, arg = SEARCH_ENDPOINTS[name]
+            for entry in content_index.entries(name):
+                if getattr(entry.metadata, 'exclude_from_sitemap', False):
+                    continue
+                lastmod = datetime.fromtimestamp(
+                    entry.mtime, tz=timezone.utc).date().isoformat()
+                urls.append((adapter.build(endpoint, {arg: entry.slug}), lastmod))
+        _sitemap_urls.clear()
+        _sitemap_urls[digests] = urls
+
+    # The homepage changes daily, so it is never part of the cached list
+    return [("/", datetime.utcnow().date().isoformat())] + urls
+
+
+def sitemap_shards():
+    """Split the sitemap URLs into lists of at most `sitemap.max_urls` each."""
+    max_urls = config.get('sitemap', {}).get('max_urls', SITEMAP_MAX_URLS)
+    urls = sitemap_urls()
+    return [urls[i:i + max_urls] for i in range(0, len(urls), max_urls)]
+
+
+# Compressed sitemaps by (path, encoding), each with the validators it matches
+_compressed_sitemaps = {}
+
+
+def sitemap_response(generate, number=None):
+    """
+    Stream a sitemap, or send a compressed copy if the client accepts one.
+
+    The compressed copy is built from the same stream, without joining it
+    into one string, and kept until the sitemap's validators change.
+    """
+    encoding = choose_encoding(request.accept_encodings, ENCODINGS)
+    if encoding is None:
+        response = Response(generate(), mimetype="application/xml")
+    else:
+        digests, _ = sitemap_validators(number)
+        key = (request.path, encoding)
+        cached = _compressed_sitemaps.get(key)
+        if cached is None or cached[0] != digests:
+            body = compress_stream((chunk.encode('utf-8') for chunk in generate()), encoding)
+            cached = _compressed_sitemaps[key] = (digests, body)
+        response = Response(cached[1], mimetype="application/xml")
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def stream_urlset(urls, number=None):
+    """Stream a <urlset> sitemap, one URL at a time."""
+    host_url = request.host_url
+
+    def generate():
+        yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for path, lastmod in urls:
+            loc = xml_escape(urljoin(host_url, path.lstrip("/")))
+            yield f"  <url><loc>{loc}</loc><lastmod>{lastmod}</lastmod></url>\n"
+        yield '</urlset>'
+
+    return sitemap_response(generate, number)
+
+
+def stream_sitemap_index(shards):
+    """Stream a <sitemapindex> pointing at each numbered sitemap shard."""
+    locs = [url_for('sitemap_shard', number=number, _external=True)
+            for number in range(1, len(shards) + 1)]
+
+    def generate():
+        yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for loc, shard in zip(locs, shards):
+            lastmod = max(lastmod for _, lastmod in shard)
+            yield (f"  <sitemap><loc>{xml_escape(loc)}</loc>"
+                   f"<lastmod>{lastmod}</lastmod></sitemap>\n")
+        yield '</sitemapindex>'
+
+    return sitemap_response(generate)
 
-    def add_url(path, lastmod):
-        """Add a URL to the sitemap."""
-        abs_url = urljoin(request.host_url, path.lstrip("/"))
-        urls.append(f"  <url><loc>{abs_url}</loc><lastmod>{lastmod}</lastmod></url>")
 
-    now = datetime.utcnow().date().isoformat()
-
-    # Homepage
-    add_url("/", now)
-
-    for name, _ in CONTENT_TYPES.items():
-        dir_path = config["paths"].get(name)
-        if not dir_path or not os.path.exists(dir_path):
-            continue
-
-        for fname in os.listdir(dir_path):
-            if not fname.endswith(".md"):
-                continue
-
-            filepath = os.path.join(dir_path, fname)
-            with open(filepath, "r", encoding="utf-8") as f:
-                text = f.read().strip()
-                if text.startswith("---"):
-                    parts = text.split("---", 2)
-                    if len(parts) >= 3:
-                        frontmatter = yaml.safe_load(parts[1])
-                        if frontmatter.get("exclude_from_sitemap", False):
-                            continue
-
-            slug = fname.rsplit(".", 1)[0]
-            lastmod = datetime.fromtimestamp(
-                os.path.getmtime(filepath), tz=timezone.utc).date().isoformat()
-            add_url(f"/{name}/{slug}", lastmod)
-
-    xml = (
-            '<?xml version="1.0" encoding="UTF-8"?>\n'
-            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
-            + "\n".join(urls) +
-            '\n</urlset>'
-    )
-    return Response(xml, mimetype="application/xml")
+@app.route("/sitemap.xml")
+@conditional(sitemap_validators)
+def sitemap_xml():
+    """Generate sitemap.xml, or the sitemap index once there are too many URLs."""
+    shards = sitemap_shards()
+    if len(shards) > 1:
+        return stream_sitemap_index(shards)
+    return stream_urlset(shards[0])
+
+
+@app.route("/sitemap_index.xml")
+@conditional(sitemap_validators)
+def sitemap_index():
+    """Generate the index of numbered sitemap shards."""
+    return stream_sitemap_index(sitemap_shards())
+
+
+@app.route("/sitemap-<int:number>.xml")
+@conditional(sitemap_validators)
+def sitemap_shard(number):
+    """Generate one numbered sitemap shard."""
+    shards = sitemap_shards()
+    if not 1 <= number <= len(shards):
+        return render_template('errors/404.html'), 404
+    return stream_urlset(shards[number - 1], number)
+
+
+# A year: content-hashed static files never change
+IMMUTABLE_MAX_AGE = 31536000
+
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    """Point url_for('static', ...) at the content-hashed copy of a file."""
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = assets.hashed(values['filename'])
+
+
+@app.endpoint('static')
+def static(filename):
+    """
+    Serve a static file, or its precompressed .br/.gz sibling if the client
+    accepts it. Content-hashed copies are cached for a year without revalidation.
+    """
+    if assets.is_hashed(filename):
+        directory, max_age = str(assets.path), IMMUTABLE_MAX_AGE
+    else:
+        directory, max_age = app.static_folder, app.get_send_file_max_age(filename)
+
+    # Resolve the name safely first; this also 404s for missing files
+    response = send_from_directory(directory, filename, max_age=max_age)
+    sibling, encoding = precompressed_sibling(os.path.join(directory, filename),
+                                              request.accept_encodings)
+    if sibling is not None:
+        response.close()
+        mimetype = response.mimetype
+        response = send_from_directory(directory, filename + os.path.splitext(sibling)[1],
+                                       mimetype=mimetype, max_age=max_age)
+        response.headers['Content-Encoding'] = encoding
+    if sibling is not None or is_compressible(response.mimetype):
+        response.vary.add('Accept-Encoding')
+    if max_age == IMMUTABLE_MAX_AGE:
+        response.cache_control.immutable = True
+    return response
 
 
 @app.route('/admin/logout')
@@ -496,6 +1124,7 @@ def save_content(content_type, slug):
 
     try:
         file_path.write_text(content, encoding='utf-8')
+        content_index.refresh(str(file_path))
         return jsonify({'success': True, 'slug': safe_slug})
     except (OSError, IOError, PermissionError) as e:
         return jsonify({'error': f'Failed to save file: {str(e)}'}), 500
@@ -517,11 +1146,22 @@ def delete_content(content_type, slug):
         backup_path = file_path.with_suffix('.md.bak')
         shutil.copy2(file_path, backup_path)
         file_path.unlink()
+        content_index.remove(str(file_path))
         return jsonify({'success': True})
     except (OSError, IOError, PermissionError) as e:
         return jsonify({'error': f'Failed to delete file: {str(e)}'}), 500
 
 
+@app.route('/api/cache/stats', methods=['GET'])
+@requires_auth
+def cache_stats():
+    """Report render and response cache hit, miss and eviction counters."""
+    return jsonify({
+        'render': render_cache.stats(),
+        'response': response_cache.stats(),
+    })
+
+
 @app.route('/api/validate-content', methods=['POST'])
 @requires_auth
 def validate_content():
@@ -555,8 +1195,7 @@ def validate_content():
             }), 400
 
         # Validate markdown content
-        md.reset()
-        html_content = md.convert('\n'.join(parts[2:]))
+        html_content = render_markdown('\n'.join(parts[2:]))
 
         return jsonify({
             'valid': True,
@@ -576,9 +1215,23 @@ def inject_now():
         'now': datetime.utcnow(),
         'title': config['site']['title'],
         'per_page': config['content']['posts_per_page'],
+        # Front-end features of the document being shown; views that render
+        # Markdown pass their own, so KaTeX and Prism load only where needed
+        'features': (),
     }
 
 
+# Checked once, so pages don't stat every vendored file per render; which is
+# why the app needs a restart after `etch vendor`
+vendored = vendored_names(app.static_folder)
+
+
+@app.template_global('vendor_urls')
+def vendor_asset_urls(name):
+    """URLs of a third-party asset: self-hosted once `etch vendor` has run, else the CDN."""
+    return vendor_urls(vendored, name, lambda filename: url_for('static', filename=filename))
+
+
 # Error handlers
 @app.errorhandler(404)
 def page_not_found(_):
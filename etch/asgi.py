@@ -0,0 +1,185 @@
+"""
+ASGI entry point for Etch.
+
+Serve the site with any ASGI server, e.g. `uvicorn asgi:application`. Anonymous
+requests that the response cache can answer are served on the event loop
+without a thread. Everything else runs through the Flask app on a bounded
+thread pool: cache misses (file I/O and rendering), admin requests and
+static files. Responses are written to the client from the event loop, so a
+slow client or a feed reader holding its connection open costs a coroutine
+rather than a worker thread.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+import sys
+
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from app import app, config, serve_from_cache
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(max_workers=config.get('asgi', {}).get('threads'),
+                              thread_name_prefix='etch-wsgi')
+
+# Cached responses are found without going through app.wsgi_app, so the
+# `proxy` settings it applies are applied here too; this one returns the environ
+forwarded = ProxyFix(lambda environ, start_response: environ, **config.get('proxy', {}))
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope and request body into a WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        # PEP 3333 wants the UTF-8 bytes of the path as latin-1 text
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def cached_response(environ):
+    """Get the response cache's answer to a request, or None"""
+    # A copy, as the full app applies the proxy settings again on a miss
+    with app.request_context(forwarded(dict(environ), None)):
+        return serve_from_cache()
+
+
+def call_wsgi(environ):
+    """
+    Run a request through the Flask app on a worker thread.
+
+    Returns:
+        tuple: (status, headers, body chunks or None, iterator or None). A
+        response with a Content-Length is read whole here; a streamed one is
+        returned as an iterator for the caller to drain chunk by chunk.
+    """
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [status, headers]
+        return lambda data: None
+
+    body = app(environ, start_response)
+    status, headers = started
+    if any(name.lower() == 'content-length' for name, _ in headers):
+        try:
+            return status, headers, list(body), None
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+    return status, headers, None, body
+
+
+def next_chunk(iterator):
+    """Read the next chunk of a streamed body, or None at the end"""
+    try:
+        return next(iterator)
+    except StopIteration:
+        return None
+
+
+async def read_body(receive):
+    """Read the whole request body"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def send_start(send, status, headers):
+    """Send the response status line and headers"""
+    await send({
+        'type': 'http.response.start',
+        'status': int(str(status).split(' ', 1)[0]),
+        'headers': [(name.lower().encode('latin-1'), str(value).encode('latin-1'))
+                    for name, value in headers],
+    })
+
+
+async def handle_http(scope, receive, send):
+    """Serve one HTTP request"""
+    body = await read_body(receive)
+    if body is None:
+        return
+    environ = build_environ(scope, body)
+    loop = asyncio.get_running_loop()
+
+    response = cached_response(environ) if scope['method'] == 'GET' else None
+    if response is not None:
+        await send_start(send, response.status, response.headers.to_wsgi_list())
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+        return
+
+    status, headers, chunks, iterator = await loop.run_in_executor(executor, call_wsgi, environ)
+    await send_start(send, status, headers)
+    if iterator is None:
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+        return
+
+    # Streamed responses, like large sitemaps: produce each chunk on the pool
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next_chunk, iterator)
+            if chunk is None:
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(iterator, 'close'):
+            await loop.run_in_executor(executor, iterator.close)
+
+
+async def handle_lifespan(receive, send):
+    """Acknowledge server startup and shutdown"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """The ASGI application"""
+    if scope['type'] == 'http':
+        await handle_http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+    else:
+        logger.warning("Unsupported ASGI scope type: %s", scope['type'])
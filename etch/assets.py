@@ -0,0 +1,191 @@
+"""
+Fingerprinted static assets.
+
+This module copies every file under `static/` to a name containing a hash of
+its contents (`css/main.3f2a9c1d0b4e.css`), minifying CSS on the way, and records the mapping in a manifest. The app rewrites
+`url_for('static', ...)` to the hashed names, which never change content and
+so can be cached by browsers and CDNs for a year without revalidation.
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import re
+
+from compression import SUFFIXES, precompress_static
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+
+# Bump when minification changes, so hashed files are rebuilt
+PIPELINE_VERSION = 2
+
+# Source maps point at the unhashed name, and siblings are made per output
+SKIP_SUFFIXES = ('.map',) + tuple(SUFFIXES.values())
+
+
+# Strings and comments, matched left to right so each hides the other's delimiters
+_CSS_TOKENS = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|/\*.*?\*/", re.DOTALL)
+_CSS_STRING = re.compile(r"\0(\d+)\0")
+_CSS_SPACE = re.compile(r"\s+")
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+_CSS_COLON = re.compile(r":\s+")
+
+
+def minify_css(source):
+    """Remove comments and insignificant whitespace from CSS"""
+    strings = []
+
+    def mask(match):
+        if match.group(1) is None:
+            return ' '
+        strings.append(match.group(1))
+        return f"\0{len(strings) - 1}\0"
+
+    css = _CSS_TOKENS.sub(mask, source)
+    css = _CSS_SPACE.sub(' ', css)
+    css = _CSS_PUNCTUATION.sub(r"\1", css)
+    # Only after a colon: a space before one separates a selector from a pseudo-class
+    css = _CSS_COLON.sub(':', css).replace(';}', '}').strip()
+    return _CSS_STRING.sub(lambda match: strings[int(match.group(1))], css)
+
+
+def minify(name, data):
+    """
+    Minify CSS files that aren't already minified.
+
+    JavaScript is copied as is: telling a regular expression from a division
+    takes a real parser, and a wrong guess breaks the script.
+    """
+    if name.endswith('.css') and '.min.' not in name:
+        return minify_css(data.decode('utf-8')).encode('utf-8')
+    return data
+
+
+class AssetManifest:
+    """
+    Content-hashed copies of the static files, and the names they map to.
+
+    Hashed files are written under `path` with the same directory layout as
+    `static/`, along with a manifest recording each source's size and mtime
+    so unchanged files aren't read again on the next build.
+    """
+
+    def __init__(self):
+        self.static_dir = None
+        self.path = None
+        self.minify = True
+        self.files = {}  # Source name: hashed name
+        self.hashed_names = set()
+
+    @property
+    def enabled(self):
+        return self.path is not None
+
+    def configure(self, static_dir, path=None, minify=True):
+        """Set the static directory and where hashed copies go (None disables)"""
+        self.static_dir = Path(static_dir)
+        self.path = Path(path).resolve() if path else None
+        self.minify = minify
+        self.files = {}
+        self.hashed_names = set()
+
+    def _load_manifest(self):
+        """Read the manifest of the last build, if it was made by this pipeline"""
+        try:
+            manifest = json.loads((self.path / MANIFEST_NAME).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != [PIPELINE_VERSION, self.minify]:
+            return None
+        return manifest.get('files', {})
+
+    def _use(self, entries):
+        """Map names to hashed names from manifest entries"""
+        self.files = {name: entry['hashed'] for name, entry in entries.items()}
+        self.hashed_names = set(self.files.values())
+
+    def load(self):
+        """
+        Use the hashed names from the last build, without checking the static
+        files or writing anything.
+
+        Returns:
+            bool: Whether a manifest from this pipeline was found
+        """
+        if not self.enabled:
+            return False
+        entries = self._load_manifest()
+        if entries is None:
+            return False
+        self._use(entries)
+        return True
+
+    def build(self):
+        """
+        Hash every static file, writing copies for any that changed.
+
+        Returns:
+            int: Number of hashed files written
+        """
+        if not self.enabled or not self.static_dir.is_dir():
+            return 0
+        manifest_path = self.path / MANIFEST_NAME
+        previous = self._load_manifest() or {}
+
+        entries, written = {}, 0
+        for source in sorted(self.static_dir.rglob('*')):
+            if not source.is_file() or source.name.endswith(SKIP_SUFFIXES):
+                continue
+            name = source.relative_to(self.static_dir).as_posix()
+            stat = source.stat()
+            entry = previous.get(name)
+            if (entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns
+                    and (self.path / entry['hashed']).exists()):
+                entries[name] = entry
+                continue
+
+            data = source.read_bytes()
+            if self.minify:
+                try:
+                    data = minify(name, data)
+                except UnicodeDecodeError:
+                    logger.warning("Not minifying %s: not UTF-8", name)
+            digest = hashlib.sha256(data).hexdigest()[:12]
+            stem, dot, suffix = source.name.partition('.')
+            hashed = (source.parent.relative_to(self.static_dir)
+                      / f"{stem}.{digest}{dot}{suffix}").as_posix()
+            target = self.path / hashed
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+                temp_path.write_bytes(data)
+                os.replace(temp_path, target)
+                written += 1
+            entries[name] = {'hashed': hashed, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        temp_path = manifest_path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        temp_path.write_text(json.dumps({'version': [PIPELINE_VERSION, self.minify],
+                                         'files': entries}, indent=2, sort_keys=True),
+                             encoding='utf-8')
+        os.replace(temp_path, manifest_path)
+        precompress_static(self.path)
+
+        self._use(entries)
+        if written:
+            logger.info("Fingerprinted %d static files into %s", written, self.path)
+        return written
+
+    def hashed(self, filename):
+        """Get the hashed name of a static file, or the name itself if it has none"""
+        return self.files.get(filename, filename)
+
+    def is_hashed(self, filename):
+        """Whether a name is one of the hashed copies"""
+        return filename in self.hashed_names
+
+
+assets = AssetManifest()
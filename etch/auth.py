@@ -2,17 +2,105 @@
 Authentication module for handling admin password management.
 
 This module provides functions for hashing, verifying, and managing
-admin passwords using Argon2 for secure password hashing.
+admin passwords using Argon2 for secure password hashing, and a throttle
+for failed login attempts. Argon2 costs are read from the `admin.argon2`
+section of config.yml, and verification runs on a small bounded thread pool
+so logins can't take over the threads that serve pages.
 """
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import copy
+import logging
 import os
 from pathlib import Path
 import secrets
+import threading
+import time
 
 from argon2 import PasswordHasher
-from argon2.exceptions import VerifyMismatchError
+from argon2.exceptions import InvalidHashError, VerifyMismatchError
 import yaml
 
-ph = PasswordHasher()
+from settings import config_service
+
+logger = logging.getLogger(__name__)
+
+# Hashers by (time_cost, memory_cost, parallelism), so config edits apply
+_DEFAULT_HASHER = PasswordHasher()
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+# Serializes writes to config.yml, which share one temp file
+_write_lock = threading.Lock()
+
+
+class VerifierBusy(Exception):
+    """Raised when too many password checks are running or queued, or one takes too long"""
+
+
+class BoundedExecutor:
+    """
+    A thread pool that refuses work instead of queueing it without limit.
+
+    At most `workers` tasks run at once and `max_pending` more wait for a
+    thread; submitting beyond that raises VerifierBusy straight away, as does
+    waiting longer than `timeout` seconds for a result. Argon2 releases the
+    GIL while hashing, so the pool caps how much CPU and memory logins use
+    without stalling other requests, and the caller's thread is never held
+    for long.
+    """
+
+    def __init__(self, workers=2, max_pending=1, timeout=5.0):
+        self._executor = None
+        self._slots = None
+        self.configure(workers, max_pending, timeout)
+
+    def configure(self, workers=2, max_pending=1, timeout=5.0):
+        """Resize the pool; tasks already submitted finish on the old one"""
+        old = self._executor
+        self.workers = max(1, int(workers))
+        self.max_pending = max(0, int(max_pending))
+        self.timeout = float(timeout)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                            thread_name_prefix='etch-verify')
+        self._slots = threading.BoundedSemaphore(self.workers + self.max_pending)
+        if old is not None:
+            old.shutdown(wait=False)
+
+    def run(self, fn, *args, timeout=None):
+        """Run fn(*args) on the pool and wait for its result, or raise VerifierBusy"""
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise VerifierBusy("Too many password checks in progress")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except FutureTimeout as e:
+            # A task still queued gives up its slot; a running one keeps it until done
+            future.cancel()
+            raise VerifierBusy("Password check timed out") from e
+
+
+verifier = BoundedExecutor()
+
+
+def get_hasher() -> PasswordHasher:
+    """Get an Argon2 hasher using the costs set in config.yml"""
+    settings = config_service.get().get('admin', {}).get('argon2') or {}
+    key = (settings.get('time_cost', _DEFAULT_HASHER.time_cost),
+           settings.get('memory_cost', _DEFAULT_HASHER.memory_cost),
+           settings.get('parallelism', _DEFAULT_HASHER.parallelism))
+    hasher = _hashers.get(key)
+    if hasher is None:
+        with _hashers_lock:
+            hasher = _hashers.setdefault(key, PasswordHasher(
+                time_cost=key[0], memory_cost=key[1], parallelism=key[2]))
+    return hasher
 
 
 def get_project_root() -> Path:
@@ -25,7 +113,7 @@ def get_project_root() -> Path:
 
 def get_config_path() -> Path:
     """Returns the absolute path to config.yaml"""
-    return get_project_root() / 'config.yml'
+    return config_service.path
 
 
 def generate_salt():
@@ -35,25 +123,46 @@ def generate_salt():
 
 def hash_password(password: str, salt: str) -> str:
     """Hash a password with a salt using Argon2"""
-    return ph.hash(f"{password}{salt}")
+    return get_hasher().hash(f"{password}{salt}")
 
 
 def verify_password(password: str, salt: str, password_hash: str) -> bool:
     """Verify a password against a hash"""
     try:
-        return ph.verify(password_hash, f"{password}{salt}")
-    except VerifyMismatchError:
+        return get_hasher().verify(password_hash, f"{password}{salt}")
+    except (VerifyMismatchError, InvalidHashError):
         return False
 
 
-def update_admin_credentials(password: str):
-    """Update admin password in config file"""
+def needs_rehash(password_hash: str) -> bool:
+    """Whether a hash was made with different Argon2 costs than configured"""
+    try:
+        return get_hasher().check_needs_rehash(password_hash)
+    except InvalidHashError:
+        return True
+
+
+def update_admin_credentials(password: str, only_if_outdated: bool = False) -> bool:
+    """
+    Update admin password in config file.
+
+    Args:
+        password (str): The new, or with only_if_outdated the current, password
+        only_if_outdated (bool): Only rewrite the hash if it was made with
+            outdated Argon2 costs
+
+    Returns:
+        bool: Whether the config file was written
+    """
     config_path = get_config_path()
-    if not config_path.exists():
-        raise FileNotFoundError(f"Config file not found at {config_path}")
+    # The parsed config is shared, so change a copy
+    config = copy.deepcopy(config_service.get())
 
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+    if only_if_outdated:
+        stored_hash = config.get('admin', {}).get('password_hash')
+        if not stored_hash or not needs_rehash(stored_hash):
+            return False
+        logger.info("Rehashing admin password with current Argon2 costs")
 
     salt = generate_salt()
     password_hash = hash_password(password, salt)
@@ -64,23 +173,32 @@ def update_admin_credentials(password: str):
     config['admin']['password_hash'] = password_hash
     config['admin']['salt'] = salt
 
-    # Write to temp file first
-    temp_path = config_path.with_suffix('.yaml.tmp')
-    with open(temp_path, 'w', encoding='utf-8') as f:
-        yaml.safe_dump(config, f)
+    with _write_lock:
+        # Write to temp file first
+        temp_path = config_path.with_suffix('.yaml.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(config, f)
 
-    # Rename temp file to actual file
-    os.replace(temp_path, config_path)
+        # Rename temp file to actual file
+        os.replace(temp_path, config_path)
+        config_service.invalidate()
+    return True
 
 
 def verify_admin_password(password: str) -> bool:
-    """Verify admin password against stored hash"""
-    config_path = get_config_path()
-    if not config_path.exists():
-        raise FileNotFoundError(f"Config file not found at {config_path}")
+    """
+    Verify admin password against stored hash, on the bounded verify pool.
+
+    Raises:
+        VerifierBusy: If too many checks are already running or queued, or
+            this one doesn't finish within the pool's timeout
+    """
+    return verifier.run(_verify_admin_password, password)
 
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
+
+def _verify_admin_password(password: str) -> bool:
+    """Verify admin password, rehashing it if its Argon2 costs are outdated"""
+    config = config_service.get()
 
     if 'admin' not in config:
         return False
@@ -91,4 +209,63 @@ def verify_admin_password(password: str) -> bool:
     if not stored_hash or not salt:
         return False
 
-    return verify_password(password, salt, stored_hash)
+    if not verify_password(password, salt, stored_hash):
+        return False
+    try:
+        update_admin_credentials(password, only_if_outdated=True)
+    except OSError as e:
+        logger.warning("Could not rehash admin password: %s", e)
+    return True
+
+
+class LoginThrottle:
+    """
+    Per-client failed login tracking with exponential backoff.
+
+    Once a client has failed `max_attempts` times within `window` seconds, it
+    is refused until a backoff of `base_delay` seconds, doubling with each
+    further failure up to `max_delay`, has passed. Refusals are immediate
+    rather than sleeping, so a brute-force attempt can't tie up the server's
+    worker threads. At most `max_clients` clients are tracked, oldest
+    dropped first.
+    """
+
+    def __init__(self, max_attempts=5, window=900, base_delay=1.0, max_delay=900,
+                 max_clients=10000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()  # client: (failures, first failure, locked until)
+
+    def retry_after(self, client):
+        """Get the seconds until a client may try again, or 0 if it may now"""
+        with self._lock:
+            state = self._clients.get(client)
+        if state is None:
+            return 0
+        return max(0.0, state[2] - time.monotonic())
+
+    def failure(self, client):
+        """Record a failed attempt by a client"""
+        now = time.monotonic()
+        with self._lock:
+            failures, first, _ = self._clients.pop(client, (0, now, 0))
+            if now - first > self.window:
+                failures, first = 0, now
+            failures += 1
+            locked_until = 0
+            if failures >= self.max_attempts:
+                delay = min(self.max_delay,
+                            self.base_delay * 2 ** (failures - self.max_attempts))
+                locked_until = now + delay
+            self._clients[client] = (failures, first, locked_until)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+    def success(self, client):
+        """Forget a client's failed attempts after it logs in"""
+        with self._lock:
+            self._clients.pop(client, None)
@@ -0,0 +1,219 @@
+"""
+Static export for Etch sites.
+
+This module renders every route of the app through the Flask test client and
+writes the responses to an output directory that any static file server can
+serve. A manifest of each output's dependency digest is kept alongside the
+output, so rebuilds only re-render routes whose sources have changed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+from urllib.parse import quote
+
+from app import app, config, post_cursor, sitemap_shards
+from assets import MANIFEST_NAME, assets
+from compression import precompress_static
+from utils import CONTENT_TYPES, content_index, digest_files
+
+MANIFEST = '.etch-build.json'
+
+
+def dependency_digests():
+    """
+    Hash each group of inputs that rendered output can depend on.
+
+    Every page depends on the templates, the config, the hashed static file
+    names and the navigation pages; listings additionally depend on every
+    file of their content type.
+    """
+    templates = [p for p in Path(config['paths']['templates']).rglob('*') if p.is_file()]
+    digests = {
+        'layout': hashlib.sha256((
+            digest_files(templates + [Path('config.yml')])
+            + json.dumps(assets.files, sort_keys=True)
+        ).encode('utf-8')).hexdigest(),
+    }
+    for name in CONTENT_TYPES:
+        digests.update({f"{name}/{entry.slug}": entry.digest
+                        for entry in content_index.entries(name)})
+        digests[name] = content_index.digest(name)
+    return digests
+
+
+def cursor_routes(prefix, query, facet=None):
+    """
+    List the keyset-cursor API pages that infinite scroll follows through a
+    post listing, optionally filtered by a (field, value) facet.
+    """
+    per_page = config['content']['posts_per_page']
+    routes = []
+    for start in range(per_page, content_index.count('posts', facet=facet), per_page):
+        last = content_index.page('posts', start - 1, start, facet=facet)[0]
+        cursor = quote(post_cursor(last), safe='')
+        routes.append((f'/api/posts?after={cursor}{query}', f'{prefix}/after/{cursor}.json',
+                       ['layout', 'posts']))
+    return routes
+
+
+def output_name(value):
+    """
+    Get the directory name a listing for a tag or category is written to.
+
+    Static servers decode the request path before looking it up on disk
+    (nginx's $uri is decoded), so the name is the raw value, not the quoted
+    one in the URL. Values that can't be a single path segment get None.
+    """
+    if value in ('', '.', '..') or '/' in value or '\0' in value:
+        return None
+    return value
+
+
+def site_routes():
+    """
+    List every route to export as (url, output path, dependency groups).
+    """
+    common = ['layout', 'pages']
+    routes = [
+        ('/', 'index.html', common + ['posts']),
+        ('/projects', 'projects/index.html', common + ['projects']),
+        ('/rss.xml', 'rss.xml', ['layout', 'posts']),
+        ('/atom.xml', 'atom.xml', ['layout', 'posts']),
+        ('/feed.json', 'feed.json', ['layout', 'posts']),
+        ('/sitemap.xml', 'sitemap.xml', ['layout', 'posts', 'pages', 'projects']),
+        ('/robots.txt', 'robots.txt', ['layout']),
+        ('/404', '404.html', common),
+    ]
+
+    # Past the protocol's URL limit, sitemap.xml becomes an index of shards
+    shards = len(sitemap_shards())
+    if shards > 1:
+        everything = ['layout', 'posts', 'pages', 'projects']
+        routes.append(('/sitemap_index.xml', 'sitemap_index.xml', everything))
+        routes += [(f'/sitemap-{n}.xml', f'sitemap-{n}.xml', everything)
+                   for n in range(1, shards + 1)]
+
+    per_page = config['content']['posts_per_page']
+    total_pages = max(1, (content_index.count('posts') + per_page - 1) // per_page)
+    for page_num in range(1, total_pages + 1):
+        routes.append((f'/api/posts?page={page_num}', f'api/posts/{page_num}.json',
+                       ['layout', 'posts']))
+    # The same pages as infinite scroll requests them, keyed by the previous page's cursor
+    routes.extend(cursor_routes('api/posts', ''))
+
+    # Tag and category listings, and the filtered pages their infinite scroll follows
+    for param, field, route in (('tag', 'tags', 'tags'), ('category', 'category', 'category')):
+        for value in content_index.facet_counts('posts', field):
+            quoted = quote(value, safe='')
+            name = output_name(value)
+            if name is not None:
+                routes.append((f'/{route}/{quoted}', f'{route}/{name}/index.html',
+                               common + ['posts']))
+            # Found through nginx's $arg_ variables, which stay quoted
+            routes.extend(cursor_routes(f'api/posts/{param}/{quoted}',
+                                        f'&{param}={quoted}', (field, value)))
+
+    for entry in content_index.entries('posts'):
+        routes.append((f'/posts/{entry.slug}', f'posts/{entry.slug}/index.html',
+                       common + [f'posts/{entry.slug}']))
+    for entry in content_index.entries('projects'):
+        routes.append((f'/projects/{entry.slug}', f'projects/{entry.slug}/index.html',
+                       common + [f'projects/{entry.slug}']))
+    for entry in content_index.entries('pages'):
+        routes.append((f'/{entry.slug}', f'{entry.slug}/index.html',
+                       common + [f'pages/{entry.slug}']))
+    return routes
+
+
+def copy_if_changed(src, dst):
+    """Copy a file unless the destination already has the same size and mtime"""
+    if os.path.exists(dst):
+        src_stat, dst_stat = os.stat(src), os.stat(dst)
+        if (src_stat.st_size, src_stat.st_mtime) == (dst_stat.st_size, dst_stat.st_mtime):
+            return dst
+    return shutil.copy2(src, dst)
+
+
+def render_route(url, output_path, expected=200):
+    """Render a single route and write it to the output tree"""
+    client = app.test_client()
+    response = client.get(url, base_url=config.get('site', {}).get('base_url'))
+    if response.status_code != expected:
+        raise RuntimeError(f"{url} returned {response.status_code}")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = output_path.with_name(output_path.name + '.tmp')
+    temp_path.write_bytes(response.get_data())
+    os.replace(temp_path, output_path)
+
+
+def build_site(output, workers=None, incremental=True, log=print):
+    """
+    Export the site as static files.
+
+    Args:
+        output (str): Directory to write the site to
+        workers (int): Number of render threads (default: chosen by Python)
+        incremental (bool): Skip routes whose dependencies are unchanged
+        log (callable): Receives a line of progress output per route
+
+    Returns:
+        tuple: (number of routes rendered, number skipped, number failed)
+    """
+    output = Path(output).resolve()
+    output.mkdir(parents=True, exist_ok=True)
+    manifest_path = output / MANIFEST
+
+    previous = {}
+    if incremental and manifest_path.exists():
+        previous = json.loads(manifest_path.read_text(encoding='utf-8'))
+
+    # Pick up static files edited since the app started
+    assets.build()
+    digests = dependency_digests()
+    manifest, pending = {}, []
+    for url, path, deps in site_routes():
+        digest = hashlib.sha256(
+            '\0'.join(digests.get(dep, '') for dep in deps).encode('utf-8')).hexdigest()
+        manifest[path] = digest
+        if previous.get(path) == digest and (output / path).exists():
+            continue
+        pending.append((url, output / path))
+
+    failed = set()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(render_route, url, path,
+                                   404 if path.name == '404.html' else 200): (url, path)
+                   for url, path in pending}
+        for future, (url, path) in futures.items():
+            try:
+                future.result()
+                log(f"  rendered {url}")
+            except (RuntimeError, OSError) as e:
+                log(f"  failed   {url}: {e}")
+                failed.add(str(path.relative_to(output)))
+
+    # Remove output for content that no longer exists
+    for path in previous.keys() - manifest.keys():
+        (output / path).unlink(missing_ok=True)
+
+    # Static assets are copied as-is, with .gz/.br siblings for servers to send
+    static_dir = Path(config['paths']['static'])
+    if static_dir.exists():
+        precompress_static(static_dir)
+        shutil.copytree(static_dir, output / 'static', dirs_exist_ok=True,
+                        copy_function=copy_if_changed)
+    # Content-hashed copies sit alongside, under the names pages link to
+    if assets.enabled and assets.path.is_dir():
+        shutil.copytree(assets.path, output / 'static', dirs_exist_ok=True,
+                        copy_function=copy_if_changed,
+                        ignore=shutil.ignore_patterns(MANIFEST_NAME, '*.tmp'))
+
+    for path in failed:
+        manifest.pop(path, None)
+    manifest_path.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+
+    return len(pending) - len(failed), len(manifest) - len(pending) + len(failed), len(failed)
@@ -0,0 +1,446 @@
+"""
+Caches for rendered content.
+
+This module provides a size-bounded in-process render cache with pluggable
+eviction policies (LRU or LFU) and hit, miss and eviction counters, a
+whole-response cache invalidated by content dependency tags, and a
+persistent SQLite-backed cache shared by every worker process and restart.
+"""
+from collections import OrderedDict, defaultdict
+from functools import wraps
+import hashlib
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LRUPolicy:
+    """Evict the least recently used key"""
+
+    def __init__(self):
+        self._order = OrderedDict()
+
+    def add(self, key):
+        """Track a newly inserted key"""
+        self._order[key] = None
+
+    def touch(self, key):
+        """Record an access to a key"""
+        self._order.move_to_end(key)
+
+    def remove(self, key):
+        """Stop tracking a key"""
+        self._order.pop(key, None)
+
+    def victim(self):
+        """Get the next key to evict"""
+        return next(iter(self._order))
+
+
+class LFUPolicy:
+    """Evict the least frequently used key, oldest first among ties"""
+
+    def __init__(self):
+        self._freq = {}
+        self._buckets = defaultdict(OrderedDict)
+        self._min_freq = 0
+
+    def add(self, key):
+        """Track a newly inserted key"""
+        self._freq[key] = 1
+        self._buckets[1][key] = None
+        self._min_freq = 1
+
+    def touch(self, key):
+        """Record an access to a key"""
+        freq = self._freq[key]
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if self._min_freq == freq:
+                self._min_freq = freq + 1
+        self._freq[key] = freq + 1
+        self._buckets[freq + 1][key] = None
+
+    def remove(self, key):
+        """Stop tracking a key"""
+        freq = self._freq.pop(key, None)
+        if freq is None:
+            return
+        bucket = self._buckets[freq]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[freq]
+            if self._min_freq == freq:
+                self._min_freq = min(self._buckets, default=0)
+
+    def victim(self):
+        """Get the next key to evict"""
+        return next(iter(self._buckets[self._min_freq]))
+
+
+EVICTION_POLICIES = {
+    'lru': LRUPolicy,
+    'lfu': LFUPolicy,
+}
+
+
+class RenderCache:
+    """
+    Size-bounded cache of rendered documents, keyed by file path.
+
+    Each entry stores the version (mtime) it was rendered from, so a lookup
+    with a newer version evicts the stale entry immediately instead of
+    leaving it for the eviction policy to push out. If `expires` is given, it
+    is called with each stored value and returns a timestamp after which the
+    entry is stale, or None for entries that never expire.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, policy='lru',
+                 sizeof=len, expires=None):
+        self._lock = threading.RLock()
+        self.sizeof = sizeof
+        self.expires = expires
+        self.configure(max_entries, max_bytes, policy)
+
+    def configure(self, max_entries=1024, max_bytes=64 * 1024 * 1024, policy='lru'):
+        """(Re)configure the cache limits and eviction policy, clearing it"""
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown cache eviction policy: {policy}")
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.policy = policy
+            self._policy = EVICTION_POLICIES[policy]()
+            self._entries = {}
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get(self, key, version):
+        """Get the cached value for key at version, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] != version or (
+                    entry[3] is not None and time.time() >= entry[3])):
+                self._remove(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._policy.touch(key)
+            return entry[1]
+
+    def put(self, key, version, value):
+        """Store a value, evicting entries until the cache is within its limits"""
+        size = self.sizeof(value)
+        if size > self.max_bytes or self.max_entries < 1:
+            return
+        expiry = self.expires(value) if self.expires else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and (len(self._entries) >= self.max_entries
+                                     or self._bytes + size > self.max_bytes):
+                self._remove(self._policy.victim())
+                self.evictions += 1
+            self._entries[key] = (version, value, size, expiry)
+            self._bytes += size
+            self._policy.add(key)
+
+    def invalidate(self, key):
+        """Drop the entry for key, if any"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry, keeping the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._policy = EVICTION_POLICIES[self.policy]()
+            self._bytes = 0
+
+    def _remove(self, key):
+        """Remove an entry; the caller must hold the lock"""
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        self._policy.remove(key)
+
+    def stats(self):
+        """Get the cache's counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'policy': self.policy,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def cached(self, func):
+        """Decorate a func(path, version) loader to read through this cache"""
+        @wraps(func)
+        def wrapper(path, version):
+            key = os.path.normpath(path)
+            value = self.get(key, version)
+            if value is None:
+                value = func(path, version)
+                self.put(key, version, value)
+            return value
+
+        wrapper.cache = self
+        return wrapper
+
+
+class ResponseCache(RenderCache):
+    """
+    Cache of whole responses, each tagged with the content it depends on.
+
+    Invalidating a tag drops every response that depends on it. Responses
+    rendered while an invalidation was in flight are never stored, since they
+    may have been built from the content being replaced.
+    """
+
+    def configure(self, max_entries=1024, max_bytes=32 * 1024 * 1024, policy='lru'):
+        """(Re)configure the cache limits and eviction policy, clearing it"""
+        with self._lock:
+            super().configure(max_entries, max_bytes, policy)
+            self._tags = defaultdict(set)
+            self._key_tags = {}
+            self.generation = 0
+
+    def put(self, key, version, value, tags=(), generation=None):
+        """
+        Store a response with its dependency tags.
+
+        Pass the `generation` read before rendering; if anything has been
+        invalidated since, the response is discarded.
+        """
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            super().put(key, version, value)
+            if key in self._entries:
+                self._key_tags[key] = set(tags)
+                for tag in tags:
+                    self._tags[tag].add(key)
+
+    def invalidate_tags(self, tags):
+        """Drop every response that depends on any of the given tags"""
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self.invalidate(key)
+
+    def clear(self):
+        """Drop every entry, keeping the counters"""
+        with self._lock:
+            super().clear()
+            self._tags.clear()
+            self._key_tags.clear()
+            self.generation += 1
+
+    def _remove(self, key):
+        """Remove an entry and its tags; the caller must hold the lock"""
+        super()._remove(key)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+
+class DiskCache:
+    """
+    Persistent render cache stored in a SQLite file.
+
+    Entries are keyed by a hash of the source content and a fingerprint of the
+    render pipeline, so any worker or restart can reuse another's renders and
+    a change to either simply misses. Writes are transactional (and so
+    atomic), and the least recently used entries are evicted once the cache
+    grows past `max_bytes`. The cache is disabled until a path is configured.
+
+    Reads never write: access times are collected in memory and saved in
+    one transaction every `touch_batch` hits or `touch_interval` seconds, and
+    before each eviction. The total size is kept in a `meta` row by triggers,
+    so a write doesn't have to add up every entry's size.
+    """
+
+    touch_batch = 64
+    touch_interval = 30.0
+
+    def __init__(self, path=None, max_bytes=256 * 1024 * 1024, fingerprint=''):
+        self.fingerprint = fingerprint
+        self.configure(path, max_bytes)
+
+    def configure(self, path=None, max_bytes=256 * 1024 * 1024, fingerprint=None):
+        """Set the database path and size cap, and optionally the fingerprint"""
+        self.path = path
+        self.max_bytes = max_bytes
+        if fingerprint is not None:
+            self.fingerprint = fingerprint
+        self._local = threading.local()
+        self._touch_lock = threading.Lock()
+        self._touched = {}  # key: access time not yet saved
+        self._touched_at = time.monotonic()
+        self._touched_pid = os.getpid()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS entries ("
+                    "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                    "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+                # Triggers first: writes made before the total exists are in the sum below
+                for event, change in (("INSERT", "NEW.size"), ("DELETE", "-OLD.size"),
+                                      ("UPDATE OF size", "NEW.size - OLD.size")):
+                    conn.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS entries_size_{event.split()[0].lower()} "
+                        f"AFTER {event} ON entries BEGIN "
+                        f"UPDATE meta SET value = value + {change} WHERE name = 'total_size'; "
+                        "END")
+                conn.execute(
+                    "INSERT OR IGNORE INTO meta (name, value) "
+                    "SELECT 'total_size', COALESCE(SUM(size), 0) FROM entries")
+
+    @property
+    def enabled(self):
+        """Whether a database path has been configured"""
+        return bool(self.path)
+
+    def _connect(self):
+        """Get a connection for this thread and process"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def key(self, *parts):
+        """Build a cache key from source content and the pipeline fingerprint"""
+        digest = hashlib.sha256(self.fingerprint.encode('utf-8'))
+        for part in parts:
+            digest.update(b'\0')
+            digest.update(part.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Get the cached value for key, or None on a miss"""
+        if not self.enabled:
+            return None
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value = pickle.loads(row[0])
+        except (sqlite3.Error, pickle.UnpicklingError, AttributeError, EOFError) as e:
+            logger.warning("Disk cache read failed for %s: %s", key, e)
+            return None
+        self._touch(key)
+        return value
+
+    def _touch(self, key):
+        """Note that key was read, saving access times once enough have built up"""
+        with self._touch_lock:
+            if self._touched_pid != os.getpid():
+                # Forked: the parent saves its own
+                self._touched, self._touched_pid = {}, os.getpid()
+            self._touched[key] = time.time()
+            due = (len(self._touched) >= self.touch_batch
+                   or time.monotonic() - self._touched_at >= self.touch_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Save the access times of entries read since the last flush"""
+        if not self.enabled:
+            return
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._touched_at = time.monotonic()
+            if self._touched_pid != os.getpid():
+                touched, self._touched_pid = {}, os.getpid()
+        if not touched:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                                 [(accessed, key) for key, accessed in touched.items()])
+        except sqlite3.Error as e:
+            logger.warning("Disk cache access time update failed: %s", e)
+
+    def put(self, key, value):
+        """Store a value, evicting least recently used entries past the size cap"""
+        if not self.enabled:
+            return
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            return
+        try:
+            with self._connect() as conn:
+                # An upsert rather than INSERT OR REPLACE, whose implicit delete
+                # wouldn't fire the trigger that keeps the total
+                conn.execute(
+                    "INSERT INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+                    "size = excluded.size, accessed = excluded.accessed",
+                    (key, blob, len(blob), time.time()))
+            if self.size() > self.max_bytes:
+                self.flush()  # So entries read recently aren't taken for unused ones
+                with self._connect() as conn:
+                    self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning("Disk cache write failed for %s: %s", key, e)
+
+    def size(self):
+        """Get the total size in bytes of the stored entries"""
+        if not self.enabled:
+            return 0
+        row = self._connect().execute(
+            "SELECT value FROM meta WHERE name = 'total_size'").fetchone()
+        return row[0] if row else 0
+
+    def _evict(self, conn):
+        """Delete the least recently used entries until under the size cap"""
+        total = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def clear(self):
+        """Delete every entry"""
+        if self.enabled:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM entries")
@@ -1,25 +1,174 @@
 """
 Command-line interface for Etch.
 
-This module contains the CLI for creating a new Etch site.
-Implements one command: etch [directory] [-b]
-    directory: The name of the project directory to create
-    -b or --bare: Omit sample content (bare scaffold)
+This module contains the CLI for creating and maintaining an Etch site.
+Implements the following commands:
+    etch [directory] [-b]: Create a new site
+        directory: The name of the project directory to create
+        -b or --bare: Omit sample content (bare scaffold)
+    etch warm [directory] [-j N]: Pre-render all content into the disk cache
+                                  and report render times
+        directory: The site directory (default: current directory)
+        -j or --workers: Number of worker processes (default: one per CPU)
+    etch build [directory] [-o OUTPUT] [-j N] [--full]: Export a fully static site
+        directory: The site directory (default: current directory)
+        -o or --output: Output directory (default: build)
+        -j or --workers: Number of render threads
+        --full: Re-render every route instead of only changed ones
+    etch vendor [directory] [--force]: Download KaTeX, Prism and Unicons into
+                                       static/vendor/ to serve them locally
+        directory: The site directory (default: current directory)
+        --force: Download again even if already vendored
     --help: Show this help message and exit
     --version: Show the version and exit
 """
 import argparse
+import os
 import shutil
 import sys
 from pathlib import Path
 
-EXCLUDE = {"__pycache__", "cli.py", "__init__.py"}
+EXCLUDE = {"__pycache__", "cli.py", "__init__.py", ".etch-cache", "build"}
 BARE_CONTENT_DIRS = {"pages", "posts", "projects"}
 
+
+def enter_site(directory):
+    """
+    Switch into an Etch site directory so its own modules and config are used.
+    """
+    site = Path(directory).resolve()
+    if not (site / "config.yml").exists():
+        print(f"Error: '{directory}' is not an Etch site (no config.yml found).")
+        sys.exit(1)
+
+    # Content paths in config.yml are relative to the site directory
+    os.chdir(site)
+    sys.path.insert(0, str(site))
+    return site
+
+
+def warm(argv):
+    """
+    Implements `etch warm`: render every content file across a process pool.
+    """
+    parser = argparse.ArgumentParser(
+        prog="etch warm",
+        description="Pre-render all content of an Etch site and report render times."
+    )
+    parser.add_argument("directory", nargs="?", default=".", help="Site directory")
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: one per CPU)"
+    )
+    args = parser.parse_args(argv)
+
+    enter_site(args.directory)
+    # Import from the site directory, after enter_site has put it on the path
+    # pylint: disable=import-outside-toplevel
+    from assets import assets
+    from compression import precompress_static
+    from utils import configure_jinja, disk_cache, load_config, summarizer, warm_content
+
+    config = load_config()
+    disk_cache.configure(**config.get("cache", {}).get("disk", {}))
+    configure_jinja(**config.get("cache", {}).get("jinja", {}))
+    summarizer.configure(config["content"]["summary_length"])
+    if not disk_cache.enabled:
+        print("⚠️  No cache.disk.path configured: renders will only be timed, not kept.")
+    timings, total = warm_content(config["paths"], args.workers)
+
+    for path, seconds in sorted(timings.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {seconds * 1000:8.1f} ms  {path}")
+    print(f"✅ Rendered {len(timings)} files in {total:.2f}s "
+          f"({sum(timings.values()):.2f}s of render time)")
+
+    assets.configure(config["paths"]["static"], **config.get("assets", {}))
+    hashed = assets.build()
+    written = precompress_static(config["paths"]["static"])
+    print(f"✅ Fingerprinted {hashed} and precompressed {written} static files")
+
+
+def build(argv):
+    """
+    Implements `etch build`: render every route to a static output tree.
+    """
+    parser = argparse.ArgumentParser(
+        prog="etch build",
+        description="Export an Etch site as static files."
+    )
+    parser.add_argument("directory", nargs="?", default=".", help="Site directory")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Output directory (default: build, inside the site)")
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=None,
+        help="Number of render threads"
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-render every route instead of only those whose sources changed"
+    )
+    args = parser.parse_args(argv)
+
+    # Resolve the output against the caller's directory before switching into the site
+    output = Path(args.output).resolve() if args.output else None
+    site = enter_site(args.directory)
+    output = output or site / "build"
+    # pylint: disable=import-outside-toplevel
+    from build import build_site
+
+    rendered, skipped, failed = build_site(output, workers=args.workers,
+                                           incremental=not args.full)
+    print(f"✅ Rendered {rendered} routes, {skipped} unchanged, {failed} failed: {output}")
+    if failed:
+        sys.exit(1)
+
+
+def vendor(argv):
+    """
+    Implements `etch vendor`: self-host the third-party assets templates use.
+    """
+    parser = argparse.ArgumentParser(
+        prog="etch vendor",
+        description="Download KaTeX, Prism and Unicons into the site's static directory."
+    )
+    parser.add_argument("directory", nargs="?", default=".", help="Site directory")
+    parser.add_argument("--force", action="store_true",
+                        help="Download again even if already vendored")
+    args = parser.parse_args(argv)
+
+    enter_site(args.directory)
+    # pylint: disable=import-outside-toplevel
+    from utils import load_config
+    from vendor import vendor_assets
+
+    config = load_config()
+    try:
+        written = vendor_assets(config["paths"]["static"], force=args.force)
+    except OSError as e:
+        print(f"Error downloading assets: {e}")
+        sys.exit(1)
+    print(f"✅ Vendored {written} files into {config['paths']['static']}/vendor")
+
+
+COMMANDS = {
+    "warm": warm,
+    "build": build,
+    "vendor": vendor,
+}
+
+
 def main():
     """
     Implements CLI.
     """
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+        return
 
     parser = argparse.ArgumentParser(description="Create a new Etch site.")
     parser.add_argument("name", help="Project directory name or '.' for current directory")
@@ -0,0 +1,159 @@
+"""
+Precompressed responses and static files.
+
+This module compresses response bodies with gzip, and with Brotli when the
+optional `brotli` package is installed, so each variant is made once per
+content change and then served by `Accept-Encoding`. It also writes `.gz` and
+`.br` siblings next to static files.
+"""
+import gzip
+import logging
+import mimetypes
+import os
+from pathlib import Path
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip alone still works
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Preferred first; only encodings we can produce are offered
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Smaller bodies gain too little to be worth a variant
+MIN_SIZE = 512
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'application/rss+xml', 'application/atom+xml', 'application/feed+json',
+    'image/svg+xml',
+)
+
+
+def is_compressible(mimetype):
+    """Whether a MIME type is text-like and worth compressing"""
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(data, encoding):
+    """Compress bytes at the highest level, since each variant is made once"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks without joining them first"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=11)
+        parts = [compressor.process(chunk) for chunk in chunks]
+        parts.append(compressor.finish())
+    else:
+        # wbits 31 writes a gzip header and trailer
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+        parts = [compressor.compress(chunk) for chunk in chunks]
+        parts.append(compressor.flush())
+    return b''.join(parts)
+
+
+def variants(body, mimetype):
+    """
+    Compress a response body in every available encoding.
+
+    Returns:
+        dict: Compressed bodies by encoding, keeping only those that are
+        smaller; empty for small or binary bodies
+    """
+    if len(body) < MIN_SIZE or not is_compressible(mimetype):
+        return {}
+    found = {}
+    for encoding in ENCODINGS:
+        data = compress(body, encoding)
+        if len(data) < len(body):
+            found[encoding] = data
+    return found
+
+
+def choose_encoding(accept_encodings, available):
+    """
+    Pick the best encoding the client accepts from those available.
+
+    Args:
+        accept_encodings: The request's parsed Accept-Encoding header
+        available: Encodings on offer, preferred first
+
+    Returns:
+        str: The encoding, or None to send the body as is
+    """
+    if not available:
+        return None
+    best = accept_encodings.best_match(list(available) + ['identity'], default='identity')
+    return None if best == 'identity' else best
+
+
+def precompress_static(directory):
+    """
+    Write .gz and .br siblings of compressible files under a directory.
+
+    Siblings already newer than their source are left alone, so this only
+    does work for files that changed.
+
+    Returns:
+        int: Number of sibling files written
+    """
+    written = 0
+    suffixes = tuple(SUFFIXES.values())
+    for path in Path(directory).rglob('*'):
+        if not path.is_file() or path.name.endswith(suffixes):
+            continue
+        mimetype, _ = mimetypes.guess_type(path.name)
+        stat = path.stat()
+        if stat.st_size < MIN_SIZE or not is_compressible(mimetype):
+            continue
+        data = None
+        for encoding in ENCODINGS:
+            sibling = path.with_name(path.name + SUFFIXES[encoding])
+            try:
+                if sibling.stat().st_mtime >= stat.st_mtime:
+                    continue
+            except FileNotFoundError:
+                pass
+            if data is None:
+                data = path.read_bytes()
+            temp_path = sibling.with_name(f"{sibling.name}.{os.getpid()}.tmp")
+            temp_path.write_bytes(compress(data, encoding))
+            os.replace(temp_path, sibling)
+            written += 1
+    if written:
+        logger.info("Precompressed %d static files in %s", written, directory)
+    return written
+
+
+def precompressed_sibling(path, accept_encodings):
+    """
+    Find an up-to-date precompressed sibling of a static file the client accepts.
+
+    Returns:
+        tuple: (sibling path, encoding), or (None, None)
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None, None
+    available = []
+    # Siblings may have been made elsewhere, so serving doesn't need brotli
+    for encoding in SUFFIXES:
+        sibling = f"{path}{SUFFIXES[encoding]}"
+        try:
+            if os.stat(sibling).st_mtime >= mtime:
+                available.append(encoding)
+        except OSError:
+            continue
+    encoding = choose_encoding(accept_encodings, available)
+    if encoding is None:
+        return None, None
+    return f"{path}{SUFFIXES[encoding]}", encoding
@@ -0,0 +1,165 @@
+"""
+Syndication feeds for Etch sites.
+
+This module turns the newest posts into a list of feed items, built once per
+content change, and serializes that one list as RSS 2.0, Atom 1.0 or JSON
+Feed 1.1. Item URLs are stored as paths so the same list serves any host.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+import json
+from typing import List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+from rfeed import Feed, Guid, Item
+
+JSON_FEED_VERSION = "https://jsonfeed.org/version/1.1"
+
+
+@dataclass
+class FeedItem:
+    """A single post as it appears in every feed format"""
+    slug: str
+    path: str
+    title: str
+    published: datetime
+    updated: Optional[datetime]
+    author: str
+    summary: str  # HTML: the description, or the rendered excerpt
+    summary_text: str  # Plain text: the description, or the plain summary
+    content: Optional[str] = None  # Full HTML, when feeds carry full content
+    tags: List[str] = field(default_factory=list)
+
+
+def _as_utc(value):
+    """Convert a date or naive datetime to an aware UTC datetime"""
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def build_items(entries, limit=20, default_author='', load_content=None):
+    """
+    Build feed items from the newest dated post entries of the content index.
+
+    Args:
+        entries (list): Post ContentEntry objects, newest first
+        limit (int): Maximum number of items; falsy for no limit
+        default_author (str): Author for posts that don't name one
+        load_content (callable): Given an entry, returns its full HTML; pass
+            None to include summaries only
+
+    Returns:
+        list: FeedItem objects, newest first
+    """
+    items = []
+    for entry in entries:
+        metadata = entry.metadata
+        if getattr(metadata, 'date', None) is None:
+            continue
+        updated = getattr(metadata, 'updated', None)
+        items.append(FeedItem(
+            slug=entry.slug,
+            path=f"/posts/{entry.slug}",
+            title=metadata.title,
+            published=_as_utc(metadata.date),
+            updated=_as_utc(updated) if updated else None,
+            author=getattr(metadata, 'author', '') or default_author,
+            summary=getattr(metadata, 'description', '') or entry.excerpt,
+            summary_text=getattr(metadata, 'description', '') or entry.summary,
+            content=load_content(entry) if load_content else None,
+            tags=list(getattr(metadata, 'tags', None) or []),
+        ))
+        if limit and len(items) >= limit:
+            break
+    return items
+
+
+def rss_feed(items, site, site_url, updated):
+    """Serialize feed items as RSS 2.0"""
+    feed = Feed(
+        title=site.get('title', 'Blog'),
+        link=site_url,
+        description=site.get('description', 'Recent blog posts'),
+        language=site.get('language', 'en-US'),
+        lastBuildDate=updated,
+        items=[
+            Item(
+                title=item.title,
+                link=site_url + item.path,
+                description=item.content or item.summary,
+                author=item.author,
+                guid=Guid(site_url + item.path),
+                pubDate=item.published,
+            )
+            for item in items
+        ],
+    )
+    return feed.rss()
+
+
+def atom_feed(items, site, site_url, feed_url, updated):
+    """Serialize feed items as Atom 1.0"""
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"  <title>{escape(site.get('title', 'Blog'))}</title>",
+        f"  <subtitle>{escape(site.get('description', 'Recent blog posts'))}</subtitle>",
+        f"  <id>{escape(site_url + '/')}</id>",
+        f"  <link href={quoteattr(site_url + '/')}/>",
+        f"  <link rel=\"self\" href={quoteattr(feed_url)}/>",
+        f"  <updated>{updated.isoformat()}</updated>",
+    ]
+    if site.get('author'):
+        lines.append(f"  <author><name>{escape(site['author'])}</name></author>")
+    for item in items:
+        url = site_url + item.path
+        lines += [
+            '  <entry>',
+            f"    <title>{escape(item.title)}</title>",
+            f"    <id>{escape(url)}</id>",
+            f"    <link href={quoteattr(url)}/>",
+            f"    <published>{item.published.isoformat()}</published>",
+            f"    <updated>{(item.updated or item.published).isoformat()}</updated>",
+        ]
+        if item.author:
+            lines.append(f"    <author><name>{escape(item.author)}</name></author>")
+        lines += [f"    <category term={quoteattr(tag)}/>" for tag in item.tags]
+        lines.append(f"    <summary type=\"html\">{escape(item.summary)}</summary>")
+        if item.content:
+            lines.append(f"    <content type=\"html\">{escape(item.content)}</content>")
+        lines.append('  </entry>')
+    lines.append('</feed>')
+    return '\n'.join(lines)
+
+
+def json_feed(items, site, site_url, feed_url):
+    """Serialize feed items as JSON Feed 1.1"""
+    feed = {
+        'version': JSON_FEED_VERSION,
+        'title': site.get('title', 'Blog'),
+        'home_page_url': site_url + '/',
+        'feed_url': feed_url,
+        'description': site.get('description', 'Recent blog posts'),
+        'language': site.get('language', 'en-US'),
+        'items': [],
+    }
+    if site.get('author'):
+        feed['authors'] = [{'name': site['author']}]
+    for item in items:
+        data = {
+            'id': site_url + item.path,
+            'url': site_url + item.path,
+            'title': item.title,
+            'summary': item.summary_text,
+            'content_html': item.content or item.summary,
+            'date_published': item.published.isoformat(),
+        }
+        if item.updated:
+            data['date_modified'] = item.updated.isoformat()
+        if item.author:
+            data['authors'] = [{'name': item.author}]
+        if item.tags:
+            data['tags'] = item.tags
+        feed['items'].append(data)
+    return json.dumps(feed, ensure_ascii=False, indent=2)
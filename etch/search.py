@@ -0,0 +1,297 @@
+"""
+Full-text search over rendered content.
+
+This module provides an in-process inverted index of posts, pages and
+projects with BM25 ranking, prefix matching of query terms and highlighted
+snippets. Documents are added and removed one at a time as content changes,
+and the whole index can be saved to disk so a restart only re-indexes files
+that changed in the meantime.
+"""
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass, field
+from html import escape
+from html.parser import HTMLParser
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Bump when tokenizing or the stored layout changes, to discard saved indexes
+INDEX_VERSION = 1
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the text of an HTML fragment, skipping scripts and styles"""
+
+    SKIP = {'script', 'style'}
+    BLOCKS = {'p', 'div', 'br', 'li', 'tr', 'pre', 'blockquote',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'td', 'th'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skipping += 1
+        elif tag in self.BLOCKS:
+            self.parts.append(' ')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skipping = max(0, self._skipping - 1)
+        elif tag in self.BLOCKS:
+            self.parts.append(' ')
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """Convert rendered HTML to plain text with collapsed whitespace"""
+    if not html:
+        return ''
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    return ' '.join(''.join(extractor.parts).split())
+
+
+@dataclass
+class SearchDocument:
+    """A single indexed document and what is needed to display a hit"""
+    doc_id: str
+    fingerprint: str
+    title: str
+    description: str
+    text: str
+    length: float
+    terms: Counter = field(default_factory=Counter)
+
+
+class SearchIndex:
+    """
+    Inverted index with BM25 ranking over weighted title, description and body.
+
+    Term frequencies are weighted per field (a title match counts more than a
+    body match) and scored with Okapi BM25. The last query term, and any term
+    with no exact match, is also matched as a prefix against the sorted term
+    list, so results appear while a word is still being typed.
+    """
+
+    FIELD_WEIGHTS = {'title': 3.0, 'description': 2.0, 'text': 1.0}
+
+    def __init__(self, k1=1.2, b=0.75, max_expansions=20):
+        self.k1 = k1
+        self.b = b
+        self.max_expansions = max_expansions
+        self._lock = threading.RLock()
+        self.fingerprint = ''
+        self.clear()
+
+    def clear(self):
+        """Drop every document"""
+        with self._lock:
+            self._docs = {}
+            self._postings = {}
+            self._terms = []
+            self._total_length = 0.0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._docs
+
+    def fingerprints(self):
+        """Get the fingerprint each document was indexed from, by id"""
+        with self._lock:
+            return {doc_id: doc.fingerprint for doc_id, doc in self._docs.items()}
+
+    def add(self, doc_id, fingerprint, title='', description='', text=''):
+        """Index a document, replacing any previous version with the same id"""
+        fields = {'title': title or '', 'description': description or '', 'text': text or ''}
+        terms = Counter()
+        for name, value in fields.items():
+            for token in tokenize(value):
+                terms[token] += self.FIELD_WEIGHTS[name]
+        doc = SearchDocument(doc_id=doc_id, fingerprint=fingerprint, title=fields['title'],
+                             description=fields['description'], text=fields['text'],
+                             length=sum(terms.values()), terms=terms)
+        with self._lock:
+            self._remove(doc_id)
+            self._docs[doc_id] = doc
+            self._total_length += doc.length
+            for term, tf in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    insort(self._terms, term)
+                postings[doc_id] = tf
+
+    def remove(self, doc_id):
+        """Drop a document from the index, if present"""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        """Drop a document; the caller must hold the lock"""
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc.length
+        for term in doc.terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _expand(self, token, prefix):
+        """Get the index terms a query token matches, with a weight for each"""
+        matches = {}
+        if token in self._postings:
+            matches[token] = 1.0
+        if prefix or not matches:
+            i = bisect_left(self._terms, token)
+            while (i < len(self._terms) and self._terms[i].startswith(token)
+                   and len(matches) <= self.max_expansions):
+                # Prefix matches count for a little less than the whole word
+                matches.setdefault(self._terms[i], 0.8)
+                i += 1
+        return matches
+
+    def search(self, query, limit=10):
+        """
+        Find the documents best matching a query.
+
+        Args:
+            query (str): Free-text query; the last word is matched as a prefix
+            limit (int): Maximum number of results
+
+        Returns:
+            list: (doc_id, score, matched terms) tuples, best first
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+            scores = Counter()
+            matched = {}
+            for i, token in enumerate(tokens):
+                for term, weight in self._expand(token, i == len(tokens) - 1).items():
+                    postings = self._postings[term]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc_id, tf in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self._docs[doc_id].length
+                                          / avg_length)
+                        scores[doc_id] += weight * idf * tf * (self.k1 + 1) / (tf + norm)
+                        matched.setdefault(doc_id, set()).add(term)
+
+        return [(doc_id, score, matched[doc_id])
+                for doc_id, score in scores.most_common(limit)]
+
+    def document(self, doc_id):
+        """Get an indexed document by id, or None"""
+        return self._docs.get(doc_id)
+
+    def snippet(self, doc_id, terms, width=160):
+        """
+        Build an HTML-escaped excerpt of a document around its first match.
+
+        Matched words are wrapped in <mark>. Falls back to the description, or
+        the start of the text, when the body has no match.
+        """
+        doc = self._docs.get(doc_id)
+        if doc is None:
+            return ''
+        pattern = re.compile(
+            r"\b(?:" + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+            + r")\w*", re.IGNORECASE | re.UNICODE) if terms else None
+
+        text = doc.text
+        match = pattern.search(text) if pattern else None
+        if match is None and doc.description:
+            text = doc.description
+            match = pattern.search(text) if pattern else None
+
+        start = max(0, match.start() - width // 3) if match else 0
+        if start:
+            # Don't start in the middle of a word
+            start = text.find(' ', start, match.start()) + 1 or start
+        end = min(len(text), start + width)
+        if end < len(text):
+            space = text.rfind(' ', start, end)
+            end = space if space > start else end
+        excerpt = text[start:end]
+
+        pieces, last = [], 0
+        for found in (pattern.finditer(excerpt) if pattern else ()):
+            pieces.append(escape(excerpt[last:found.start()]))
+            pieces.append(f"<mark>{escape(found.group())}</mark>")
+            last = found.end()
+        pieces.append(escape(excerpt[last:]))
+        return ('...' if start else '') + ''.join(pieces) + ('...' if end < len(text) else '')
+
+    def save(self, path):
+        """Write the index to disk atomically"""
+        with self._lock:
+            state = {
+                'version': INDEX_VERSION,
+                'fingerprint': self.fingerprint,
+                'docs': self._docs,
+            }
+            blob = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(temp_path, path)
+
+    def load(self, path, fingerprint=''):
+        """
+        Read an index saved by save(), if it matches the given fingerprint.
+
+        Returns:
+            bool: Whether a saved index was loaded
+        """
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, pickle.UnpicklingError, AttributeError, EOFError) as e:
+            logger.warning("Could not load search index from %s: %s", path, e)
+            return False
+        if state.get('version') != INDEX_VERSION or state.get('fingerprint') != fingerprint:
+            return False
+
+        with self._lock:
+            self.clear()
+            self.fingerprint = fingerprint
+            for doc in state['docs'].values():
+                self._docs[doc.doc_id] = doc
+                self._total_length += doc.length
+                for term, tf in doc.terms.items():
+                    self._postings.setdefault(term, {})[doc.doc_id] = tf
+            self._terms = sorted(self._postings)
+        return True
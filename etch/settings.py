@@ -0,0 +1,58 @@
+"""
+Site configuration service.
+
+This module parses config.yml once and shares the result with every module
+that needs it (app, auth and utils.load_config). The file is re-parsed only
+when its modification time changes, so credential updates are picked up
+without re-reading the file on every request. The app reads the rest of
+the config once at startup, so other settings need a restart.
+"""
+import logging
+import os
+from pathlib import Path
+import threading
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigService:
+    """
+    config.yml, parsed once and reloaded when the file changes.
+
+    The returned dict is shared; callers that want to change the config
+    should copy it, write the file and call invalidate().
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._config = None
+
+    def get(self):
+        """Get the parsed config, re-parsing it if the file has changed"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"Config file not found at {self.path}") from e
+        if mtime == self._mtime:
+            return self._config
+
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    config = yaml.safe_load(f) or {}
+                if self._mtime is not None:
+                    logger.info("Reloaded %s", self.path)
+                self._config, self._mtime = config, mtime
+            return self._config
+
+    def invalidate(self):
+        """Force the next get() to re-parse the file"""
+        with self._lock:
+            self._mtime = None
+
+
+config_service = ConfigService(Path(__file__).resolve().parent / 'config.yml')
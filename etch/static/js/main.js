@@ -1,15 +1,20 @@
 // Initialize KaTeX rendering
+// KaTeX and Prism are only included on pages whose content uses them
 document.addEventListener("DOMContentLoaded", function() {
-    renderMathInElement(document.body, {
-        delimiters: [
-            {left: "$$", right: "$$", display: true},
-            {left: "$", right: "$", display: false}
-        ],
-        throwOnError: false
-    });
+    if (typeof renderMathInElement !== "undefined") {
+        renderMathInElement(document.body, {
+            delimiters: [
+                {left: "$$", right: "$$", display: true},
+                {left: "$", right: "$", display: false}
+            ],
+            throwOnError: false
+        });
+    }
 
     // Re-trigger Prism highlighting
-    Prism.highlightAll();
+    if (typeof Prism !== "undefined") {
+        Prism.highlightAll();
+    }
 });
 
 
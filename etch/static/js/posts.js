@@ -12,7 +12,10 @@
   };
 
   onReady(function () {
-    let currentPage = 1;
+    // Keyset cursor of the last post shown, so pages stay stable as posts are added
+    let nextCursor = document.getElementById('posts-container').dataset.nextCursor;
+    // Filter of tag and category listings (e.g. "tag=python"), kept on every request
+    const query = document.getElementById('posts-container').dataset.query;
     let loading = false;
 
     function formatDate(isoDate) {
@@ -46,14 +49,16 @@
             loadMoreBtn.style.display = 'none';
             loadingSpinner.style.display = 'block';
 
-            const response = await fetch(`/api/posts?page=${currentPage + 1}`);
+            let url = `/api/posts?after=${encodeURIComponent(nextCursor)}`;
+            if (query) url += `&${query}`;
+            const response = await fetch(url);
             const data = await response.json();
 
             if (data.posts.length > 0) {
                 const postsHtml = data.posts.map(createPostCard).join('');
                 postsContainer.insertAdjacentHTML('beforeend', postsHtml);
-                currentPage = data.pagination.current_page;
             }
+            nextCursor = data.pagination.next_cursor;
 
             // Show/hide load more button based on pagination
             if (!data.pagination.has_next) {
@@ -5,59 +5,263 @@ This module provides utilities for loading and processing Markdown files,
 managing metadata, and handling various content types including posts,
 pages, and projects.
 """
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
+import logging
 import os
 import re
 import shutil
+import threading
+import time
 from dataclasses import dataclass
-from datetime import date, datetime
-from functools import lru_cache
+from datetime import date, datetime, timezone
+from html import escape
+from html.parser import HTMLParser
 from pathlib import Path
-from typing import Callable, List, Optional
+from typing import Callable, List, Optional, Tuple
 
+import jinja2
 import markdown
+import pymdownx
 import yaml
-from flask import abort, current_app
-from jinja2 import Environment, BaseLoader
+from flask import abort
+from jinja2 import BaseLoader, FileSystemBytecodeCache, meta
+from jinja2.sandbox import SandboxedEnvironment
 from markdown.extensions.codehilite import CodeHiliteExtension
 from markdown.extensions.toc import TocExtension
 
+from cache import DiskCache, RenderCache
+import markdown_extensions
 from markdown_extensions import EnhancedMarkdownExtension
+from settings import config_service
 
 # pylint: disable=too-few-public-methods,too-many-instance-attributes
 
-# Configure Markdown once
-md = markdown.Markdown(extensions=[
-    'meta',
-    'tables',
-    # 'markdown.extensions.lists',
-    'markdown.extensions.footnotes',
-    'markdown.extensions.smarty',
-    'markdown.extensions.fenced_code',
-    'markdown.extensions.attr_list',
-    'markdown.extensions.def_list',
-    TocExtension(permalink=True),
-    CodeHiliteExtension(
-        css_class='highlight',
-        use_pygments=False,  # Don't use Pygments
-        guess_lang=False     # Don't guess language
-    ),
-    # CodeHiliteExtension(css_class='highlight'),
-    # FencedCodeExtension(),
-    'pymdownx.arithmatex',
-    EnhancedMarkdownExtension(),
-], extension_configs={
-    'pymdownx.arithmatex': {
-        'generic': True,
+logger = logging.getLogger(__name__)
+
+def create_markdown():
+    """
+    Build a Markdown instance with Etch's extension stack.
+
+    Markdown instances carry per-document state (TOC, footnotes, meta), so
+    each thread gets its own via get_markdown() rather than sharing one.
+    Extensions are instantiated per call because they bind to their instance.
+    """
+    return markdown.Markdown(extensions=[
+        'meta',
+        'tables',
+        # 'markdown.extensions.lists',
+        'markdown.extensions.footnotes',
+        'markdown.extensions.smarty',
+        'markdown.extensions.fenced_code',
+        'markdown.extensions.attr_list',
+        'markdown.extensions.def_list',
+        TocExtension(permalink=True),
+        CodeHiliteExtension(
+            css_class='highlight',
+            use_pygments=False,  # Don't use Pygments
+            guess_lang=False     # Don't guess language
+        ),
+        # CodeHiliteExtension(css_class='highlight'),
+        # FencedCodeExtension(),
+        'pymdownx.arithmatex',
+        EnhancedMarkdownExtension(),
+    ], extension_configs={
+        'pymdownx.arithmatex': {
+            'generic': True,
+        }
+    })
+
+
+_renderers = threading.local()
+
+
+def get_markdown():
+    """Get this thread's Markdown instance, creating it on first use"""
+    renderer = getattr(_renderers, 'md', None)
+    if renderer is None:
+        renderer = _renderers.md = create_markdown()
+    return renderer
+
+
+def render_markdown(text):
+    """Convert Markdown to HTML using this thread's Markdown instance"""
+    renderer = get_markdown()
+    renderer.reset()
+    return renderer.convert(text)
+
+def document_name(source):
+    """Name a document body's template by a hash of its source"""
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+class _DocumentLoader(BaseLoader):
+    """
+    Loader for document bodies, named by a hash of their source.
+
+    Loading documents by name lets them share the Environment's template and
+    bytecode caches, which from_string() bypasses. Names are content hashes,
+    so a cached template is never out of date.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get_source(self, environment, template):
+        source = getattr(self._local, 'source', None)
+        if source is None:
+            raise jinja2.TemplateNotFound(template)
+        return source, None, lambda: True
+
+    def get_document(self, environment, source):
+        """Get the compiled template for a document body"""
+        name = document_name(source)
+        self._local.source = source
+        try:
+            return environment.get_template(name)
+        finally:
+            self._local.source = None
+
+
+# One sandboxed Environment shared by every document, as Markdown bodies are
+# content rather than trusted code. Bytecode is cached once configured.
+jinja_env = SandboxedEnvironment(loader=_DocumentLoader(), auto_reload=False)
+
+# Fenced code blocks are kept out of Jinja so their contents stay literal
+_CODE_BLOCK = re.compile(r"(```.*?```|~~~.*?~~~)", re.DOTALL)
+_CODE_PLACEHOLDER = re.compile(r"\[\{CODEBLOCK_(\d+)\}\]")
+_JINJA_SYNTAX = re.compile(r"\{[{%#]")
+
+# Seconds that renders of documents using dynamic context (e.g. `now`) stay fresh
+_dynamic_ttl = 3600
+
+
+def configure_jinja(bytecode_path=None, dynamic_ttl=3600):
+    """
+    Set the directory Jinja bytecode is cached in (None disables it), and how
+    long renders of documents using dynamic context stay fresh.
+    """
+    global _dynamic_ttl  # pylint: disable=global-statement
+    _dynamic_ttl = dynamic_ttl
+    if bytecode_path:
+        os.makedirs(bytecode_path, exist_ok=True)
+        jinja_env.bytecode_cache = FileSystemBytecodeCache(bytecode_path)
+    else:
+        jinja_env.bytecode_cache = None
+
+
+def dynamic_window(now=None):
+    """
+    Get the (start, end) timestamps of the current dynamic render window.
+
+    Renders of dynamic documents expire at the end of the window they were
+    made in, so every worker's copy goes stale at the same moment.
+    """
+    now = time.time() if now is None else now
+    ttl = _dynamic_ttl
+    if ttl <= 0:
+        return now, now
+    start = now // ttl * ttl
+    return start, start + ttl
+
+
+def _mask_code_blocks(text):
+    """
+    Swap fenced code blocks for placeholders, so Jinja leaves them alone.
+
+    Returns:
+        tuple: (masked text, the code blocks in order)
+    """
+    # Splitting on the capturing pattern alternates prose and code blocks
+    pieces = _CODE_BLOCK.split(text)
+    masked = ''.join(
+        piece if i % 2 == 0 else f"[{{CODEBLOCK_{i // 2}}}]"
+        for i, piece in enumerate(pieces))
+    return masked, pieces[1::2]
+
+
+def document_context():
+    """The context document bodies are rendered with; all of it changes over time"""
+    return {
+        'now': datetime.now(),
     }
-})
+
+
+# Names in document_context(), known without building it
+DOCUMENT_CONTEXT = frozenset(document_context())
+
+# Variables each masked body reads, keyed by its template name. Entries are a
+# few names per distinct body, so this isn't bounded like Jinja's own cache.
+_document_variables = {}
+
+
+def _undeclared_variables(masked, name):
+    """
+    Get the names a masked body's Jinja reads from its context, found by
+    static analysis once per body.
+
+    Raises:
+        jinja2.TemplateSyntaxError: If the body isn't valid Jinja
+    """
+    variables = _document_variables.get(name)
+    if variables is None:
+        variables = _document_variables[name] = frozenset(
+            meta.find_undeclared_variables(jinja_env.parse(masked)))
+    return variables
+
+
+def uses_dynamic_context(text):
+    """
+    Whether a Markdown body's Jinja reads the document context, found by
+    parsing it rather than rendering it.
+
+    This is what prerender() reports for the same body, so the index can tell
+    which documents have expiring renders without rendering them.
+    """
+    if not _JINJA_SYNTAX.search(text):
+        return False
+    masked, _ = _mask_code_blocks(text)
+    if not _JINJA_SYNTAX.search(masked):
+        return False
+    try:
+        variables = _undeclared_variables(masked, document_name(masked))
+    except jinja2.TemplateSyntaxError:
+        return False  # Rendering it gives an error message, which doesn't expire
+    return bool(variables & DOCUMENT_CONTEXT)
+
+
+def prerender(text, context):
+    """
+    Render the Jinja in a Markdown body, leaving fenced code blocks untouched.
+
+    Documents without any Jinja syntax outside code blocks are returned as-is.
+    Code blocks are swapped for placeholders and restored in one pass each.
+
+    Returns:
+        tuple: (rendered text, names of the context variables the body uses)
+    """
+    if not _JINJA_SYNTAX.search(text):
+        return text, frozenset()
+
+    masked, blocks = _mask_code_blocks(text)
+    if not _JINJA_SYNTAX.search(masked):
+        return text, frozenset()
+
+    template = jinja_env.loader.get_document(jinja_env, masked)
+    variables = _undeclared_variables(masked, template.name)
+    rendered = template.render(**context)
+
+    def restore(match):
+        i = int(match.group(1))
+        return blocks[i] if i < len(blocks) else match.group(0)
+
+    return _CODE_PLACEHOLDER.sub(restore, rendered), variables & context.keys()
+
 
 def load_config():
-    """Load configuration from YAML file"""
-    # Import here to avoid circular imports
-    from auth import get_config_path  # pylint: disable=import-outside-toplevel
-    config_path = get_config_path()
-    with open(config_path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+    """Load configuration from YAML file, parsed once and shared"""
+    return config_service.get()
 
 def parse_date(date_str):
     """Parse date string into datetime object"""
@@ -72,6 +276,114 @@ def parse_date(date_str):
     except (ValueError, TypeError):
         return datetime.now()
 
+def naive_utc(value):
+    """
+    Make a date or datetime comparable with any other: a naive UTC datetime.
+
+    YAML gives plain dates, naive datetimes or, for timestamps with an
+    offset, aware ones, and Python can't order aware against naive. Other
+    values are returned as is.
+    """
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    return value
+
+def parse_optional_date(date_str):
+    """Parse a date that may be left out, giving None rather than now if it is"""
+    if isinstance(date_str, (date, datetime)):
+        return date_str
+    try:
+        return datetime.strptime(date_str, '%Y-%m-%d')
+    except (ValueError, TypeError):
+        return None
+
+# libyaml's C loader is much faster, when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def load_yaml(text):
+    """Parse YAML with the fastest available safe loader"""
+    return yaml.load(text, Loader=YAML_LOADER)
+
+
+def _split_frontmatter(lines):
+    """
+    Split a document's YAML frontmatter from its body, consuming `lines` only
+    as far as the closing `---` delimiter.
+
+    Returns:
+        tuple: (frontmatter, rest of the closing line), or (None, None) if the
+            document has no frontmatter
+    """
+    head = []
+    opened = False
+    for line in lines:
+        if not opened:
+            if not line.strip():
+                continue
+            line = line.lstrip()
+            if not line.startswith('---'):
+                return None, None
+            opened, line = True, line[3:]
+        if '---' in line:
+            before, after = line.split('---', 1)
+            head.append(before)
+            return ''.join(head), after
+        head.append(line)
+    return None, None
+
+
+def _parse_frontmatter(frontmatter, filepath):
+    """Turn frontmatter YAML into the metadata for a file's content type"""
+    raw_metadata = load_yaml(frontmatter) or {}
+    if not isinstance(raw_metadata, dict):
+        raise ValueError(f"frontmatter is a {type(raw_metadata).__name__}, not a mapping")
+    return process_metadata(raw_metadata, determine_content_type(filepath))
+
+
+def read_frontmatter(filepath):
+    """
+    Read a file's metadata from its YAML frontmatter, without its body.
+
+    The file is only read up to the closing `---` delimiter and the body is
+    never rendered, which makes this cheap enough for listings.
+
+    Returns:
+        BaseMetadata: The file's metadata, or {} if it has no frontmatter
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        frontmatter, _ = _split_frontmatter(f)
+    if frontmatter is None:
+        return {}
+    return _parse_frontmatter(frontmatter, filepath)
+
+
+def scan_document(filepath):
+    """
+    Read everything the content index keeps about a file in one pass: a
+    digest of its name and contents (as digest_files computes it), its
+    frontmatter metadata, and whether its body uses dynamic Jinja context,
+    found from the source without rendering it.
+
+    Returns:
+        tuple: (digest, metadata, dynamic)
+    """
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(os.fsencode(str(filepath)) + data).hexdigest()
+    lines = iter(data.decode('utf-8').splitlines(keepends=True))
+    frontmatter, rest = _split_frontmatter(lines)
+    if frontmatter is None:
+        return digest, {}, False
+    # Only bodies after frontmatter are rendered with Jinja (see _render_content)
+    body = (rest + ''.join(lines)).strip()
+    return digest, _parse_frontmatter(frontmatter, filepath), uses_dynamic_context(body)
+
+
 def determine_content_type(filepath):
     """Determine content type based on file location"""
     if 'posts/' in filepath:
@@ -92,12 +404,16 @@ class ContentType:
     sort_key: str = "date"
     reverse: bool = True
     parser: Callable = None  # Optional custom loader if needed
+    facets: Tuple[str, ...] = ()  # Metadata fields to keep secondary indexes on
 
 
 CONTENT_TYPES = {
-    "posts": ContentType(name="posts", path="posts", template="post.html"),
-    "pages": ContentType(name="pages", path="pages", template="page.html", reverse=False),
-    "projects": ContentType(name="projects", path="projects", template="project.html"),
+    "posts": ContentType(name="posts", path="posts", template="post.html",
+                         facets=("tags", "category", "status")),
+    "pages": ContentType(name="pages", path="pages", template="page.html",
+                         sort_key="nav_order", reverse=False),
+    "projects": ContentType(name="projects", path="projects", template="project.html",
+                            sort_key="date_started", facets=("technologies", "status")),
 }
 
 
@@ -107,6 +423,7 @@ class BaseMetadata:
     title: str
     description: str
     template: str
+    exclude_from_sitemap: bool = False
 
 @dataclass
 class PageMetadata(BaseMetadata):
@@ -151,6 +468,7 @@ def process_metadata(metadata: dict, content_type: str) -> BaseMetadata:
         'title': metadata.get('title', 'Untitled'),
         'description': metadata.get('description', ''),
         'template': metadata.get('template', content_type),
+        'exclude_from_sitemap': metadata.get('exclude_from_sitemap', False),
     }
 
     if content_type == 'page':
@@ -165,7 +483,8 @@ def process_metadata(metadata: dict, content_type: str) -> BaseMetadata:
         return PostMetadata(
             **base_data,
             date=parse_date(metadata.get('date')),
-            updated=parse_date(metadata.get('updated')),
+            # Unlike the publication date, an unset update date stays unset
+            updated=parse_optional_date(metadata.get('updated')),
             author=metadata.get('author', 'Anonymous'),
             tags=metadata.get('tags', []),
             category=metadata.get('category', 'Uncategorized'),
@@ -187,73 +506,240 @@ def process_metadata(metadata: dict, content_type: str) -> BaseMetadata:
     return BaseMetadata(**base_data)
 
 
-@lru_cache(maxsize=128)
+def _rendered_size(result):
+    """Size in bytes of the HTML and summaries in a _load_file() result"""
+    size = len(result[1].encode('utf-8')) if result[1] else 0
+    if result[2] is not None:
+        size += len(result[2].text.encode('utf-8')) + len(result[2].excerpt.encode('utf-8'))
+    return size
+
+
+# Configured from the `cache.render` section of config.yml at startup
+render_cache = RenderCache(sizeof=_rendered_size, expires=lambda result: result[3])
+
+
+def render_fingerprint():
+    """
+    Fingerprint the render pipeline: library versions and Etch's render code.
+
+    Persistent cache entries are keyed on this, so upgrading Markdown or its
+    extensions, or editing the code in this module, invalidates them.
+    """
+    digest = hashlib.sha256()
+    for version in (markdown.__version__, pymdownx.__version__,
+                    jinja2.__version__, yaml.__version__):
+        digest.update(version.encode('utf-8'))
+    for module_file in (__file__, markdown_extensions.__file__):
+        with open(module_file, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# Configured from the `cache.disk` section of config.yml at startup
+disk_cache = DiskCache(fingerprint=render_fingerprint())
+
+
+@dataclass
+class Summary:
+    """Listing summaries of a rendered document, computed once per render"""
+    text: str  # Plain text, cut at a word boundary
+    excerpt: str  # Sanitized HTML with every tag closed
+    word_count: int
+
+
+class _ExcerptBuilder(HTMLParser):
+    """
+    Copy the opening text of rendered HTML up to a length.
+
+    Only simple inline tags are kept (links only with http(s), relative or
+    fragment URLs); everything else is reduced to its text, and scripts,
+    styles and heading permalinks are dropped. Words are counted through to
+    the end of the document.
+    """
+
+    INLINE = {'a', 'b', 'code', 'em', 'i', 'strong'}
+    SKIP = {'script', 'style'}
+    BLOCKS = {'blockquote', 'br', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+              'li', 'p', 'pre', 'td', 'th', 'tr'}
+
+    def __init__(self, length):
+        super().__init__(convert_charrefs=True)
+        self.remaining = length
+        self.text = []
+        self.html = []
+        self.open = []
+        self.truncated = False
+        self.word_count = 0
+        self._skipping = []
+        self._space = True
+
+    def _separate(self):
+        if not self._space:
+            self.text.append(' ')
+            self.html.append(' ')
+            self.remaining -= 1
+            self._space = True
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in self.SKIP or 'headerlink' in (attrs.get('class') or '').split():
+            self._skipping.append(tag)
+        elif self._skipping or self.remaining <= 0:
+            return
+        elif tag in self.INLINE:
+            attr = ''
+            href = attrs.get('href') or ''
+            if tag == 'a' and href.startswith(('http://', 'https://', '/', '#')):
+                attr = f' href="{escape(href)}"'
+            self.html.append(f"<{tag}{attr}>")
+            self.open.append(tag)
+        elif tag in self.BLOCKS:
+            self._separate()
+
+    def handle_endtag(self, tag):
+        if self._skipping:
+            if tag == self._skipping[-1]:
+                self._skipping.pop()
+        elif tag in self.open:
+            while self.open:
+                closed = self.open.pop()
+                self.html.append(f"</{closed}>")
+                if closed == tag:
+                    break
+        elif tag in self.BLOCKS and self.remaining > 0:
+            self._separate()
+
+    def handle_data(self, data):
+        if self._skipping:
+            return
+        self.word_count += len(data.split())
+        if self.remaining <= 0:
+            self.truncated = self.truncated or bool(data.strip())
+            return
+
+        data = re.sub(r"\s+", " ", data)
+        if self._space:
+            data = data.lstrip()
+        if len(data) > self.remaining:
+            # Cut at the last word boundary that fits
+            cut = data.rfind(' ', 0, self.remaining + 1)
+            data = data[:cut if cut > 0 else self.remaining].rstrip()
+            self.truncated = True
+            self.remaining = 0
+        else:
+            self.remaining -= len(data)
+        if data:
+            self.text.append(data)
+            self.html.append(escape(data))
+            self._space = data.endswith(' ')
+
+
+class Summarizer:
+    """Builds listing summaries of rendered HTML at the configured length"""
+
+    def __init__(self, length=200):
+        self.configure(length)
+
+    def configure(self, length=200):
+        """Set the summary length in characters"""
+        self.length = length
+
+    def summarize(self, content):
+        """Get the plain-text summary, HTML excerpt and word count of rendered HTML"""
+        if not content:
+            return Summary(text='', excerpt='', word_count=0)
+        builder = _ExcerptBuilder(self.length)
+        builder.feed(content)
+        builder.close()
+        ellipsis = '...' if builder.truncated else ''
+        text = ''.join(builder.text).strip()
+        excerpt = ''.join(builder.html).strip() + ''.join(
+            f"</{tag}>" for tag in reversed(builder.open))
+        return Summary(text=text + ellipsis, excerpt=excerpt + ellipsis,
+                       word_count=builder.word_count)
+
+
+# Configured from `content.summary_length` in config.yml at startup
+summarizer = Summarizer()
+
+
+@render_cache.cached
 def _load_file(filepath, _mtime):
     """Load and parse a markdown file with YAML frontmatter"""
-    # pylint: disable=too-many-locals
-    current_app.logger.info(f"Cache miss! Loading file {filepath} {_mtime}")
+    logger.info("Cache miss! Loading file %s %s", filepath, _mtime)
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             content = f.read().strip()
-
-            if content.startswith('---'):
-                parts = content.split('---', 2)
-                if len(parts) >= 3:
-                    md.reset()
-                    raw_metadata = yaml.safe_load(parts[1])
-                    content_type = determine_content_type(filepath)
-                    metadata = process_metadata(raw_metadata, content_type)
-
-                    try:
-                        md_raw = parts[2].strip()
-
-                        # Step 1: Extract and replace code blocks
-                        code_blocks = {}
-
-                        def mask_code_block(match):
-                            i = len(code_blocks)
-                            key = f"[{{CODEBLOCK_{i}}}]"
-                            code_blocks[key] = match.group(0)
-                            return key
-
-                        pattern = r"(```.*?```|~~~.*?~~~)"
-                        masked_md = re.sub(pattern, mask_code_block, md_raw, flags=re.DOTALL)
-
-                        # Step 2: Render remaining Markdown with Jinja
-                        context = {
-                            'now': datetime.now(),
-                        }
-
-                        rtemplate = Environment(loader=BaseLoader).from_string(masked_md)
-                        jinja_rendered = rtemplate.render(**context)
-
-                        # Step 3: Restore original code blocks
-                        for key, block in code_blocks.items():
-                            jinja_rendered = jinja_rendered.replace(key, block)
-
-                        # Step 4: Convert to HTML
-                        html_content = md.convert(jinja_rendered)
-                        return metadata, html_content
-
-                    except yaml.YAMLError as e:
-                        print(f"Error parsing YAML metadata: {e}")
-                        return metadata, f"<p>Error processing content: {e}</p>"
-                    except (ValueError, TypeError) as e:
-                        print(f"Error converting markdown: {e}")
-                        return metadata, f"<p>Error processing content: {e}</p>"
-
-            # Handle files without frontmatter
-            md.reset()
-            html_content = md.convert(content)
-            return {}, html_content
-
     except FileNotFoundError:
         abort(404)
-        return None, None
+        return None, None, None, None, ()
     except (OSError, IOError) as e:
         print(f"Error processing file {filepath}: {e}")
         abort(404)
-        return None, None
+        return None, None, None, None, ()
+
+    # Rendering depends only on the source and content type, so renders can be
+    # shared through the disk cache by every worker and across restarts
+    content_type = determine_content_type(filepath)
+    key = disk_cache.key(content_type, str(summarizer.length), content)
+    result = disk_cache.get(key)
+    if result is None:
+        metadata, html_content, expires = _render_content(content, content_type)
+        # Summaries and features are derived here once, rather than per request
+        result = (metadata, html_content, summarizer.summarize(html_content), expires,
+                  detect_features(html_content))
+        # Static renders are good forever; dynamic ones only until they expire
+        if expires is None:
+            disk_cache.put(key, result)
+    return result
+
+
+# Markup that needs a front-end library: arithmatex output for KaTeX, and
+# code blocks for Prism
+_FEATURE_MARKERS = {
+    'math': re.compile(r'class="arithmatex"'),
+    'code': re.compile(r'class="(?:[^"]* )?(?:highlight|language-[\w-]+)[ "]'),
+}
+
+
+def detect_features(html):
+    """Get the names of the front-end features a rendered document uses"""
+    if not html:
+        return ()
+    return tuple(name for name, marker in _FEATURE_MARKERS.items() if marker.search(html))
+
+
+def _render_content(content, content_type):
+    """Render markdown source with optional YAML frontmatter"""
+    if content.startswith('---'):
+        parts = content.split('---', 2)
+        if len(parts) >= 3:
+            raw_metadata = load_yaml(parts[1])
+            metadata = process_metadata(raw_metadata or {}, content_type)
+
+            try:
+                md_raw = parts[2].strip()
+
+                # Step 1: Render Jinja outside code blocks. Everything in the
+                # context changes over time, so a body that uses any of it is
+                # only fresh until the end of the current dynamic window.
+                jinja_rendered, dynamic = prerender(md_raw, document_context())
+                expires = dynamic_window()[1] if dynamic else None
+
+                # Step 2: Convert to HTML
+                html_content = render_markdown(jinja_rendered)
+                return metadata, html_content, expires
+
+            except yaml.YAMLError as e:
+                print(f"Error parsing YAML metadata: {e}")
+                return metadata, f"<p>Error processing content: {e}</p>", None
+            except (ValueError, TypeError, jinja2.TemplateError) as e:
+                print(f"Error converting markdown: {e}")
+                return metadata, f"<p>Error processing content: {e}</p>", None
+
+    # Handle files without frontmatter
+    html_content = render_markdown(content)
+    return {}, html_content, None
 
 
 def get_mtime(path):
@@ -263,12 +749,455 @@ def get_mtime(path):
 
 def load_markdown_file(filepath):
     """Load and parse a markdown file with YAML frontmatter"""
+    metadata, content, _ = load_document(filepath)
+    return metadata, content
+
+
+def load_document(filepath):
+    """
+    Load a markdown file for display.
+
+    Returns:
+        tuple: (metadata, html, names of the front-end features it uses)
+    """
+    # When a watcher keeps the index fresh, trust its mtimes instead of stat-ing
+    if content_index.watching:
+        name, slug = content_index.locate(filepath)
+        if name is not None:
+            entry = content_index.get(name, slug)
+            if entry is None:
+                abort(404)
+            metadata, content, _, _, features = _load_file(filepath, entry.mtime)
+            return metadata, content, features
 
     # Check if file exists before trying to get mtime
     if not os.path.exists(filepath):
         abort(404)
 
-    return _load_file(filepath, os.path.getmtime(filepath))
+    metadata, content, _, _, features = _load_file(filepath, os.path.getmtime(filepath))
+    return metadata, content, features
+
+
+def digest_files(paths):
+    """Hash the names and contents of a collection of files"""
+    digest = hashlib.sha256()
+    for path in sorted(str(p) for p in paths):
+        digest.update(os.fsencode(path))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def list_content_files(directories):
+    """List the markdown files in each existing content directory"""
+    files = []
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for filename in os.listdir(directory):
+            if filename.endswith('.md'):
+                files.append(os.path.join(directory, filename))
+    return files
+
+
+def _init_warm_worker(disk_path, disk_max_bytes, summary_length, bytecode_cache,
+                      dynamic_ttl):
+    """Share the parent's cache, summary and Jinja settings with a warmup worker process"""
+    disk_cache.configure(disk_path, disk_max_bytes)
+    summarizer.configure(summary_length)
+    global _dynamic_ttl  # pylint: disable=global-statement
+    jinja_env.bytecode_cache = bytecode_cache
+    _dynamic_ttl = dynamic_ttl
+
+
+def _render_timed(filepath):
+    """Render a file uncached in a worker process, returning its timing"""
+    start = time.perf_counter()
+    mtime = os.path.getmtime(filepath)
+    result = _load_file.__wrapped__(filepath, mtime)
+    return filepath, mtime, result, time.perf_counter() - start
+
+
+def warm_content(paths, workers=None):
+    """
+    Render all content across a process pool and fill the render cache.
+
+    Workers read and write the disk cache, if one is configured, so warming
+    from the CLI also prepares renders for the app's workers.
+
+    Args:
+        paths (dict): The `paths` section of config.yml
+        workers (int): Number of worker processes (default: one per CPU)
+
+    Returns:
+        tuple: ({filepath: render seconds}, total elapsed seconds)
+    """
+    start = time.perf_counter()
+    files = list_content_files(os.path.normpath(paths[name])
+                               for name in CONTENT_TYPES if paths.get(name))
+    timings = {}
+    if not files:
+        return timings, 0.0
+
+    with ProcessPoolExecutor(max_workers=workers or None,
+                             initializer=_init_warm_worker,
+                             initargs=(disk_cache.path, disk_cache.max_bytes, summarizer.length,
+                                       jinja_env.bytecode_cache,
+                                       _dynamic_ttl)) as executor:
+        futures = [executor.submit(_render_timed, filepath) for filepath in files]
+        for future in as_completed(futures):
+            try:
+                filepath, mtime, result, seconds = future.result()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("Error warming content: %s", e)
+                continue
+            render_cache.put(os.path.normpath(filepath), mtime, result)
+            timings[filepath] = seconds
+
+    return timings, time.perf_counter() - start
+
+
+@dataclass
+class ContentEntry:
+    """
+    Indexed listing data for a single content file.
+
+    Metadata is read from the frontmatter alone. Anything derived from the
+    body is rendered (or taken from the render cache) on first use.
+    """
+    slug: str
+    path: str
+    mtime: float
+    digest: str
+    metadata: BaseMetadata
+    # Whether the body uses dynamic Jinja context, so its render expires.
+    # Known from the source, so validators can check it without rendering.
+    dynamic: bool = False
+
+    @property
+    def rendered(self):
+        """The (metadata, html, summary, expires, features) render of this version of the file"""
+        return _load_file(self.path, self.mtime)
+
+    @property
+    def summary(self):
+        """Plain-text listing summary"""
+        return self.rendered[2].text
+
+    @property
+    def excerpt(self):
+        """Sanitized HTML listing excerpt"""
+        return self.rendered[2].excerpt
+
+    @property
+    def word_count(self):
+        """Number of words in the rendered body"""
+        return self.rendered[2].word_count
+
+    @property
+    def features(self):
+        """Front-end features (e.g. 'math', 'code') the rendered body uses"""
+        return self.rendered[4]
+
+
+class ContentIndex:
+    """
+    Process-wide index of content metadata, slugs, mtimes and summaries.
+
+    The index is built once at startup so that listing routes can be served
+    from memory instead of listing and stat-ing every file on each request.
+    Entries are updated through refresh() and remove() when files change,
+    typically driven by a watcher (see watcher.py). While `watching` is set,
+    the index is trusted as the source of truth for file mtimes and existence.
+
+    Each content type's entries are also kept in a sequence sorted by its
+    sort key (then slug), updated incrementally by bisection, so a page of a
+    listing can be sliced out without touching the rest. The same is done
+    per value of each of the type's facets (e.g. one sequence per tag), which
+    serve as inverted indexes for filtered listings.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._dirs = {}
+        self._entries = {name: {} for name in CONTENT_TYPES}
+        self._keys = {name: [] for name in CONTENT_TYPES}
+        self._ordered = {name: [] for name in CONTENT_TYPES}
+        self._facets = self._empty_facets()
+        self._sorted = {}
+        self._digests = {}
+        self._navigation = None
+        self._listeners = []
+        self.watching = False
+
+    def build(self, paths):
+        """Scan every content directory and index each markdown file"""
+        with self._lock:
+            self._dirs = {name: os.path.normpath(paths[name])
+                          for name in CONTENT_TYPES if paths.get(name)}
+            self._entries = {name: {} for name in CONTENT_TYPES}
+            self._keys = {name: [] for name in CONTENT_TYPES}
+            self._ordered = {name: [] for name in CONTENT_TYPES}
+            self._facets = self._empty_facets()
+            self._sorted = {}
+            self._digests = {}
+            self._navigation = None
+
+            for filepath in list_content_files(self._dirs.values()):
+                self.refresh(filepath)
+
+    def directories(self):
+        """Get the indexed content directories"""
+        return list(self._dirs.values())
+
+    def locate(self, filepath):
+        """Return the (content type name, slug) of an indexed file path"""
+        directory, filename = os.path.split(os.path.normpath(filepath))
+        if not filename.endswith('.md'):
+            return None, None
+        for name, content_dir in self._dirs.items():
+            if content_dir == directory:
+                return name, filename[:-3]
+        return None, None
+
+    def refresh(self, filepath):
+        """
+        Re-load a single file into the index, or drop it if it no longer exists.
+
+        A file whose frontmatter can't be parsed keeps its previous entry (or
+        stays out of the index), so one bad edit can't take the site down.
+        """
+        name, slug = self.locate(filepath)
+        if name is None:
+            return None
+
+        try:
+            mtime = os.path.getmtime(filepath)
+            # Listings only need the frontmatter; bodies are rendered on demand
+            digest, metadata, dynamic = scan_document(filepath)
+        except OSError:
+            self.remove(filepath)
+            return None
+        except (yaml.YAMLError, ValueError, TypeError) as e:
+            logger.error("Error reading frontmatter of %s: %s", filepath, e)
+            return self.get(name, slug)
+
+        entry = ContentEntry(
+            slug=slug,
+            path=filepath,
+            mtime=mtime,
+            digest=digest,
+            metadata=metadata,
+            dynamic=dynamic,
+        )
+        with self._lock:
+            previous = self._entries[name].get(slug)
+            self._unorder(name, previous)
+            self._entries[name][slug] = entry
+            self._order(name, entry)
+            self._changed(name)
+        # Free the old render now rather than when the file is next requested
+        if previous is None or previous.mtime != mtime:
+            render_cache.invalidate(os.path.normpath(filepath))
+        self._notify(name, slug)
+        return entry
+
+    def remove(self, filepath):
+        """Drop a file from the index"""
+        name, slug = self.locate(filepath)
+        if name is None:
+            return
+        with self._lock:
+            entry = self._entries[name].pop(slug, None)
+            removed = entry is not None
+            if removed:
+                self._unorder(name, entry)
+                self._changed(name)
+        render_cache.invalidate(os.path.normpath(filepath))
+        if removed:
+            self._notify(name, slug)
+
+    def subscribe(self, listener):
+        """Call listener(name, slug) whenever an indexed file changes"""
+        self._listeners.append(listener)
+
+    def _notify(self, name, slug):
+        """Tell listeners that a file has changed"""
+        for listener in self._listeners:
+            listener(name, slug)
+
+    def _changed(self, name):
+        """Drop data derived from a content type's entries; the caller must hold the lock"""
+        self._sorted.pop(name, None)
+        self._digests.pop(name, None)
+        if name == 'pages':
+            self._navigation = None
+
+    def digest(self, name):
+        """Get a hash of every file of a content type, which changes when any of them do"""
+        with self._lock:
+            digest = self._digests.get(name)
+            if digest is None:
+                combined = hashlib.sha256()
+                for slug, entry in sorted(self._entries[name].items()):
+                    combined.update(f"{slug}\0{entry.digest}\0".encode('utf-8'))
+                digest = self._digests[name] = combined.hexdigest()
+            return digest
+
+    def navigation(self):
+        """
+        Get the navigation menu: pages with show_in_nav, sorted by nav_order.
+
+        Computed once and kept until a page changes.
+        """
+        with self._lock:
+            if self._navigation is None:
+                self._navigation = [
+                    {
+                        'slug': entry.slug,
+                        'title': entry.metadata.title,
+                        'description': entry.metadata.description,
+                        'order': entry.metadata.nav_order,
+                        'icon': entry.metadata.nav_icon,
+                    }
+                    for entry in self.entries('pages')
+                    if isinstance(entry.metadata, PageMetadata) and entry.metadata.show_in_nav
+                ]
+            return self._navigation
+
+    def last_modified(self, name):
+        """Get the newest mtime of any file of a content type"""
+        return max((entry.mtime for entry in self._entries[name].values()), default=0.0)
+
+    def get(self, name, slug):
+        """Get the entry for a single file, or None if it isn't indexed"""
+        return self._entries.get(name, {}).get(slug)
+
+    def current(self, name, slug):
+        """
+        Get the entry for a single file, re-reading the file first if it changed.
+
+        While a watcher reports changes this is get(). Otherwise the file is
+        stat-ed, so an edit is picked up (and listeners told) on first use.
+        """
+        entry = self.get(name, slug)
+        if self.watching or name not in self._dirs:
+            return entry
+        path = entry.path if entry is not None else os.path.join(self._dirs[name], f"{slug}.md")
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            if entry is not None:
+                self.remove(path)
+            return None
+        if entry is None or entry.mtime != mtime:
+            return self.refresh(path)
+        return entry
+
+    def sort_key(self, name, entry):
+        """Get the ascending sort key of an entry, or None if it can't be sorted"""
+        value = getattr(entry.metadata, CONTENT_TYPES[name].sort_key, None)
+        if value is None:
+            return None
+        return naive_utc(value), entry.slug
+
+    @staticmethod
+    def _empty_facets():
+        """Build empty secondary indexes: {name: {field: {value: (keys, entries)}}}"""
+        return {name: {field: {} for field in content_type.facets}
+                for name, content_type in CONTENT_TYPES.items()}
+
+    @staticmethod
+    def facet_values(entry, field):
+        """Get the values an entry is indexed under for a facet field"""
+        value = getattr(entry.metadata, field, None)
+        if value is None or value == '':
+            return set()
+        if isinstance(value, (list, tuple, set)):
+            return {str(item) for item in value}
+        return {str(value)}
+
+    def _sequences(self, name, entry):
+        """Get every sorted (keys, entries) sequence an entry belongs in"""
+        sequences = [(self._keys[name], self._ordered[name])]
+        for field, values in self._facets[name].items():
+            for value in self.facet_values(entry, field):
+                sequences.append(values.setdefault(value, ([], [])))
+        return sequences
+
+    def _order(self, name, entry):
+        """Insert an entry into its sorted sequences; the caller must hold the lock"""
+        key = self.sort_key(name, entry)
+        if key is not None:
+            for keys, ordered in self._sequences(name, entry):
+                i = bisect_left(keys, key)
+                keys.insert(i, key)
+                ordered.insert(i, entry)
+
+    def _unorder(self, name, entry):
+        """Remove an entry from its sorted sequences; the caller must hold the lock"""
+        key = entry and self.sort_key(name, entry)
+        if key is not None:
+            for keys, ordered in self._sequences(name, entry):
+                i = bisect_left(keys, key)
+                if i < len(keys) and keys[i] == key:
+                    del keys[i]
+                    del ordered[i]
+            # Drop facet values that no longer have any entries
+            for values in self._facets[name].values():
+                for value in [v for v, (keys, _) in values.items() if not keys]:
+                    del values[value]
+
+    def _sequence(self, name, facet=None):
+        """Get the sorted (keys, entries) of a type, or of one (field, value) facet"""
+        if facet is None:
+            return self._keys[name], self._ordered[name]
+        field, value = facet
+        return self._facets[name].get(field, {}).get(value, ([], []))
+
+    def count(self, name, facet=None):
+        """Get the number of sortable (listable) entries of a type or facet value"""
+        return len(self._sequence(name, facet)[0])
+
+    def facet_counts(self, name, field):
+        """Get the number of entries for each value of a facet field"""
+        with self._lock:
+            return {value: len(keys)
+                    for value, (keys, _) in self._facets[name].get(field, {}).items()}
+
+    def page(self, name, start, stop, facet=None):
+        """Get the sortable entries at positions [start, stop) in listing order"""
+        with self._lock:
+            ordered = self._sequence(name, facet)[1]
+            if not CONTENT_TYPES[name].reverse:
+                return ordered[start:stop]
+            total = len(ordered)
+            return ordered[max(0, total - stop):max(0, total - start)][::-1]
+
+    def page_after(self, name, key, count, facet=None):
+        """Get up to `count` sortable entries that follow a sort key in listing order"""
+        with self._lock:
+            keys, ordered = self._sequence(name, facet)
+            if not CONTENT_TYPES[name].reverse:
+                i = bisect_right(keys, key)
+                return ordered[i:i + count]
+            i = bisect_left(keys, key)
+            return ordered[max(0, i - count):i][::-1]
+
+    def entries(self, name):
+        """Get all entries of a content type, sorted by its configured key"""
+        with self._lock:
+            items = self._sorted.get(name)
+            if items is None:
+                items = self.page(name, 0, self.count(name))
+                # Unsortable entries go last
+                items += [entry for entry in self._entries[name].values()
+                          if self.sort_key(name, entry) is None]
+                self._sorted[name] = items
+            return items
+
+
+content_index = ContentIndex()
 
 
 def safe_file_operation(file_path, operation_func):
@@ -303,17 +1232,19 @@ def get_content_listing(content_dir):
 
     return files
 
-def calculate_reading_time(text, wpm=250):
+def calculate_reading_time(text='', wpm=250, word_count=None):
     """
     Calculate reading time in minutes based on word count.
 
     Args:
         text (str): The text content to analyze
         wpm (int): Words per minute reading speed (default 250 for average adult)
+        word_count (int): Precomputed word count, used instead of splitting text
 
     Returns:
         int: Estimated reading time in minutes
     """
-    word_count = len(text.split())
+    if word_count is None:
+        word_count = len(text.split())
     minutes = max(1, round(word_count / wpm))
     return minutes
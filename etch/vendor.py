@@ -0,0 +1,129 @@
+"""
+Self-hosted copies of third-party front-end assets.
+
+This module downloads the KaTeX, Prism and Unicons files that `base.html`
+uses into `static/vendor/`, along with the fonts their stylesheets point at,
+and concatenates the Prism core and language components into one bundle.
+Until the files are vendored, templates fall back to the CDN URLs, so a new
+site works before `etch vendor` has ever been run.
+"""
+import logging
+import os
+from pathlib import Path
+import re
+from urllib.parse import urljoin, urlparse
+from urllib.request import urlopen
+
+logger = logging.getLogger(__name__)
+
+KATEX = "https://cdn.jsdelivr.net/npm/katex@0.16.9/dist"
+PRISM = "https://cdn.jsdelivr.net/npm/prismjs@1.29.0"
+UNICONS = "https://unicons.iconscout.com/release-pro/v4.0.8"
+
+PRISM_LANGUAGES = ('python', 'javascript', 'bash', 'markdown')
+
+# Vendored name (under static/vendor/): the URLs it is made from, in order.
+# Names with several URLs are bundles, concatenated into one file.
+VENDOR_ASSETS = {
+    'katex/katex.min.css': [f"{KATEX}/katex.min.css"],
+    'katex/katex.min.js': [f"{KATEX}/katex.min.js"],
+    'katex/auto-render.min.js': [f"{KATEX}/contrib/auto-render.min.js"],
+    'prism/prism.bundle.min.js': [f"{PRISM}/prism.min.js"] + [
+        f"{PRISM}/components/prism-{language}.min.js" for language in PRISM_LANGUAGES],
+    'unicons/css/thinline.css': [f"{UNICONS}/css/thinline.css"],
+}
+
+VENDOR_DIR = 'vendor'
+
+# Relative url(...) references in a stylesheet, e.g. fonts
+_CSS_URL = re.compile(r"url\(\s*['\"]?([^'\")]+?)['\"]?\s*\)")
+
+
+def fetch(url, timeout=30):
+    """Download a URL"""
+    with urlopen(url, timeout=timeout) as response:
+        return response.read()
+
+
+def _write(path, data):
+    """Write a file atomically, creating its directory"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+def stylesheet_dependencies(css, base_url):
+    """
+    Find the files a stylesheet references by relative URL.
+
+    Returns:
+        list: (relative reference, absolute URL) pairs
+    """
+    found = []
+    for reference in dict.fromkeys(_CSS_URL.findall(css)):
+        if reference.startswith(('data:', '#', '/')) or urlparse(reference).scheme:
+            continue
+        found.append((reference, urljoin(base_url, reference)))
+    return found
+
+
+def vendor_assets(static_dir, force=False):
+    """
+    Download every vendored asset into the static directory.
+
+    Files already present are kept unless `force` is set. A stylesheet's
+    relative references are fetched next to it, so its fonts resolve the same
+    way they do on the CDN.
+
+    Returns:
+        int: Number of files written
+    """
+    root = Path(static_dir) / VENDOR_DIR
+    written = 0
+    for name, urls in VENDOR_ASSETS.items():
+        target = root / name
+        if target.exists() and not force:
+            continue
+        # Bundled scripts are separated so each one's last statement ends
+        data = b'\n;\n'.join(fetch(url).rstrip() for url in urls) + b'\n'
+        _write(target, data)
+        written += 1
+        logger.info("Vendored %s", name)
+
+        if name.endswith('.css'):
+            for reference, url in stylesheet_dependencies(data.decode('utf-8'), urls[0]):
+                dependency = (target.parent / reference.split('?')[0].split('#')[0]).resolve()
+                if root.resolve() not in dependency.parents:
+                    logger.warning("Not vendoring %s: outside %s", reference, root)
+                    continue
+                if dependency.exists() and not force:
+                    continue
+                _write(dependency, fetch(url))
+                written += 1
+    return written
+
+
+def vendored_names(static_dir):
+    """Get the names in VENDOR_ASSETS that have been downloaded into static_dir"""
+    root = os.path.join(static_dir, VENDOR_DIR)
+    return frozenset(name for name in VENDOR_ASSETS
+                     if os.path.isfile(os.path.join(root, name)))
+
+
+def vendor_urls(vendored, name, url_for):
+    """
+    Get the URLs to load a vendored asset from.
+
+    Args:
+        vendored (frozenset): Names already vendored, from vendored_names()
+        name (str): A key of VENDOR_ASSETS
+        url_for (callable): Builds a URL for a file in the static directory
+
+    Returns:
+        list: The self-hosted URL if the asset has been vendored, otherwise
+        the CDN URLs it is made from
+    """
+    if name in vendored:
+        return [url_for(f"{VENDOR_DIR}/{name}")]
+    return list(VENDOR_ASSETS[name])
@@ -0,0 +1,238 @@
+"""
+Filesystem watchers for keeping the content index fresh.
+
+This module provides background watchers that report created, modified and
+deleted markdown files in the content directories. On Linux the inotify
+backend is used; elsewhere, or if inotify is unavailable, the watcher falls
+back to polling the directories at a fixed interval.
+"""
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# inotify event masks, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class BaseWatcher(threading.Thread):
+    """Base class for watchers that report changed files to a callback"""
+
+    backend = 'base'
+
+    def __init__(self, directories, callback, extension='.md', on_exit=None):
+        super().__init__(name=f"etch-{self.backend}-watcher", daemon=True)
+        self.directories = [os.path.normpath(d) for d in directories if os.path.isdir(d)]
+        self.callback = callback
+        self.extension = extension
+        self.on_exit = on_exit
+        self.replacement = None  # A watcher that took over when this one stopped
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """Ask the watcher thread, and any that took over from it, to exit"""
+        self._stop_event.set()
+        if self.replacement is not None:
+            self.replacement.stop()
+
+    def run(self):
+        try:
+            self.watch()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("The %s watcher stopped: %s", self.backend, e)
+        finally:
+            self.stopped()
+
+    def stopped(self):
+        """Called when the thread ends; nothing reports changes any more"""
+        if self.on_exit is not None:
+            self.on_exit()
+
+    def watch(self):
+        """Report changes until stopped"""
+        raise NotImplementedError
+
+    def _scan(self):
+        """Get the mtime of every watched file"""
+        mtimes = {}
+        for directory in self.directories:
+            try:
+                with os.scandir(directory) as it:
+                    for item in it:
+                        if item.name.endswith(self.extension):
+                            mtimes[os.path.join(directory, item.name)] = item.stat().st_mtime
+            except OSError as e:
+                logger.warning("Could not scan %s: %s", directory, e)
+        return mtimes
+
+    def notify(self, filepath):
+        """Pass a changed path to the callback, never letting it kill the thread"""
+        if not filepath.endswith(self.extension):
+            return
+        try:
+            self.callback(filepath)
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error("Error handling change to %s: %s", filepath, e)
+
+
+class PollingWatcher(BaseWatcher):
+    """Watcher that scans each directory's mtimes every `interval` seconds"""
+
+    backend = 'poll'
+
+    def __init__(self, directories, callback, interval=1.0, mtimes=None, **kwargs):
+        super().__init__(directories, callback, **kwargs)
+        self.interval = interval
+        # Files whose mtime isn't known (None) are reported on the first scan
+        self._mtimes = self._scan() if mtimes is None else mtimes
+
+    def watch(self):
+        while not self._stop_event.wait(self.interval):
+            mtimes = self._scan()
+            for path, mtime in mtimes.items():
+                if self._mtimes.get(path) != mtime:
+                    self.notify(path)
+            for path in self._mtimes.keys() - mtimes.keys():
+                self.notify(path)
+            self._mtimes = mtimes
+
+
+class InotifyWatcher(BaseWatcher):
+    """
+    Watcher backed by Linux inotify, with no per-file polling.
+
+    If the thread stops other than through stop(), a PollingWatcher scanning
+    every `fallback_interval` seconds takes over, first reporting every file
+    this one knew of, since changes may have been missed in between.
+    """
+
+    backend = 'inotify'
+
+    def __init__(self, directories, callback, fallback_interval=None, **kwargs):
+        super().__init__(directories, callback, **kwargs)
+        self.fallback_interval = fallback_interval
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._wds = {}
+        for directory in self.directories:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                os.close(self._fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self._wds[wd] = directory
+        # Every file seen, so changes lost to a queue overflow can be found
+        self._files = set(self._scan())
+
+    def watch(self):
+        try:
+            while not self._stop_event.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                try:
+                    buffer = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                try:
+                    paths = list(self._parse(buffer))
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.error("Could not read inotify events, rescanning: %s", e)
+                    paths = self._rescan()
+                for path in paths:
+                    self.notify(path)
+        finally:
+            os.close(self._fd)
+
+    def stopped(self):
+        if self.fallback_interval is None or self._stop_event.is_set():
+            super().stopped()
+            return
+        logger.warning("Falling back to polling every %s s", self.fallback_interval)
+        self.replacement = PollingWatcher(
+            self.directories, self.callback, interval=self.fallback_interval,
+            mtimes=dict.fromkeys(self._files | set(self._scan())),
+            extension=self.extension, on_exit=self.on_exit)
+        self.replacement.start()
+
+    def _rescan(self):
+        """Get every file that may have changed: all those seen before or now"""
+        current = set(self._scan())
+        paths = sorted(self._files | current)
+        self._files = current
+        return paths
+
+    def _parse(self, buffer):
+        """Yield the file paths named by a buffer of inotify events"""
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            # Decoded like os.listdir() does, so names that aren't UTF-8 still round-trip
+            name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # The kernel dropped events, so any file may have changed
+                logger.warning("inotify queue overflowed, rescanning")
+                yield from self._rescan()
+            elif name and wd in self._wds:
+                path = os.path.join(self._wds[wd], name)
+                if path.endswith(self.extension):
+                    if mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._files.discard(path)
+                    else:
+                        self._files.add(path)
+                yield path
+
+
+def start_watcher(directories, callback, backend='auto', interval=1.0, on_exit=None):
+    """
+    Start a background watcher over the given directories.
+
+    Args:
+        directories (list): Directories to watch (not recursive)
+        callback (callable): Called with the path of each created, modified or deleted file
+        backend (str): 'inotify', 'poll', 'auto' (inotify if available) or 'off'
+        interval (float): Seconds between scans for the polling backend
+        on_exit (callable): Called if the watcher thread stops (for inotify,
+            once the polling watcher that takes over from it stops)
+
+    Returns:
+        BaseWatcher: The running watcher, or None if watching is disabled
+    """
+    if backend in (None, False, 'off'):
+        return None
+
+    watcher = None
+    if backend in ('auto', 'inotify') and sys.platform.startswith('linux'):
+        try:
+            watcher = InotifyWatcher(directories, callback, fallback_interval=interval,
+                                     on_exit=on_exit)
+        except (OSError, AttributeError) as e:
+            if backend == 'inotify':
+                raise
+            logger.warning("inotify unavailable, falling back to polling: %s", e)
+    elif backend == 'inotify':
+        raise OSError("The inotify watcher backend is only available on Linux")
+
+    if watcher is None:
+        watcher = PollingWatcher(directories, callback, interval=interval, on_exit=on_exit)
+
+    watcher.start()
+    return watcher
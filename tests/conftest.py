@@ -0,0 +1,65 @@
+"""
+Shared test setup.
+
+Etch's modules are imported flat from a site directory, and the paths in its
+config.yml are relative to that directory, the same way `etch` runs a site
+(see cli.enter_site). The tests run against a throwaway copy of the sample
+site so they can write content and config without touching the repo.
+"""
+import os
+from pathlib import Path
+import shutil
+import sys
+import tempfile
+
+import pytest
+import yaml
+
+ETCH_DIR = Path(__file__).resolve().parent.parent / 'etch'
+
+
+def pytest_configure(config):
+    site = Path(tempfile.mkdtemp(prefix='etch-site-'))
+    shutil.copytree(ETCH_DIR, site, dirs_exist_ok=True,
+                    ignore=shutil.ignore_patterns('__pycache__', '.etch-cache', 'build'))
+    # The app's own watcher would race tests that edit files; watcher tests start theirs
+    config_path = site / 'config.yml'
+    site_config = yaml.safe_load(config_path.read_text(encoding='utf-8'))
+    site_config['cache']['watch'] = {'backend': 'off'}
+    config_path.write_text(yaml.safe_dump(site_config), encoding='utf-8')
+    os.chdir(site)
+    sys.path.insert(0, str(site))
+    config.etch_site = site
+
+
+def pytest_unconfigure(config):
+    site = getattr(config, 'etch_site', None)
+    if site is not None:
+        shutil.rmtree(site, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def site(pytestconfig):
+    """The site directory the tests run in"""
+    return pytestconfig.etch_site
+
+
+@pytest.fixture
+def content_dirs(tmp_path):
+    """Empty posts, pages and projects directories, as a config `paths` mapping"""
+    paths = {}
+    for name in ('posts', 'pages', 'projects'):
+        (tmp_path / name).mkdir()
+        paths[name] = str(tmp_path / name)
+    return paths
+
+
+@pytest.fixture
+def write_post():
+    """Write a content file with the given frontmatter and body; returns its path"""
+    def write(directory, slug, frontmatter, body='Body text.'):
+        path = os.path.join(directory, f"{slug}.md")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"---\n{frontmatter}\n---\n\n{body}\n")
+        return path
+    return write
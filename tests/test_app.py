@@ -0,0 +1,148 @@
+"""Tests for the Flask routes"""
+import os
+
+import pytest
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+import app as etch_app
+from app import app, content_index, entry_expiry, entry_validators
+from auth import LoginThrottle, VerifierBusy
+import utils
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.mark.parametrize('after', [
+    '2023-01-01T00:00:00+00:00,p1',
+    '2023-01-01T00:00:00Z,p1',
+    '2023-01-01,p1',
+])
+def test_posts_cursor_accepts_offsets(client, after):
+    response = client.get('/api/posts', query_string={'after': after})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('after', ['nonsense', '2023-13-01,p1', '0001-01-01T00:00:00+01:00,p1'])
+def test_posts_cursor_rejects_invalid(client, after):
+    response = client.get('/api/posts', query_string={'after': after})
+    assert response.status_code == 400
+
+
+def test_validators_never_render(monkeypatch):
+    def fail(*args):
+        raise AssertionError("validators rendered a document")
+
+    monkeypatch.setattr(utils, '_load_file', fail)
+    for name in ('posts', 'pages', 'projects'):
+        for entry in content_index.entries(name):
+            assert entry_validators(name, entry.slug) is not None
+            entry_expiry(name, entry.slug)
+
+
+def test_busy_verifier_gives_503(client, monkeypatch):
+    def busy(password):
+        raise VerifierBusy("Password check timed out")
+
+    monkeypatch.setattr(etch_app, 'verify_admin_password', busy)
+    response = client.post('/admin/login', data={'password': 'x'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_login_throttle_uses_forwarded_client(client, monkeypatch):
+    monkeypatch.setattr(app, 'wsgi_app', ProxyFix(app.wsgi_app.app, x_for=1))
+    monkeypatch.setattr(etch_app, 'login_throttle', LoginThrottle(max_attempts=2))
+    monkeypatch.setattr(etch_app, 'verify_admin_password', lambda password: False)
+
+    def login(address):
+        return client.post('/admin/login', data={'password': 'x'},
+                           headers={'X-Forwarded-For': address}).status_code
+
+    assert [login('203.0.113.1') for _ in range(3)] == [401, 401, 429]
+    # Another client behind the same proxy isn't locked out
+    assert login('203.0.113.2') == 401
+
+
+@pytest.fixture
+def unwatched_post(site, monkeypatch):
+    """A post in the app's index, edited on disk while no watcher is running"""
+    monkeypatch.setattr(content_index, 'watching', False)
+    path = site / 'posts' / 'unwatched.md'
+    path.write_text("---\ntitle: Before\ndate: 2024-01-01\nstatus: published\n---\n\nFirst.\n",
+                    encoding='utf-8')
+    content_index.refresh(str(path.relative_to(site)))
+
+    def edit():
+        path.write_text("---\ntitle: After\ndate: 2024-01-01\nstatus: published\n---\n\n"
+                        "Second.\n", encoding='utf-8')
+        later = path.stat().st_mtime + 10
+        os.utime(path, (later, later))
+
+    yield edit
+    path.unlink()
+    content_index.remove(str(path.relative_to(site)))
+
+
+def test_validators_follow_edits_without_a_watcher(client, unwatched_post):
+    first = client.get('/posts/unwatched')
+    assert first.status_code == 200
+    unwatched_post()
+
+    response = client.get('/posts/unwatched', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != first.headers['ETag']
+    assert b'After' in response.data
+
+
+def test_cached_responses_follow_edits_without_a_watcher(client, unwatched_post):
+    assert b'Before' in client.get('/posts/unwatched').data
+    unwatched_post()
+
+    # No conditional headers: only the response cache stands in the way
+    response = client.get('/posts/unwatched')
+    assert b'After' in response.data
+
+
+def test_search_reindexes_only_changed_files(client, site, monkeypatch):
+    monkeypatch.setitem(etch_app.search_config, 'save_delay', 60)  # Flushed by hand below
+    assert client.get('/api/search', query_string={'q': 'okapi'}).status_code == 200
+    assert etch_app.search_synced.is_set()
+
+    def fail(*args):
+        raise AssertionError("an unchanged file was re-indexed")
+
+    monkeypatch.setattr(etch_app, 'load_markdown_file', fail)
+    monkeypatch.setattr(etch_app.search_index, 'save', fail)
+    for name in ('posts', 'pages', 'projects'):
+        for entry in content_index.entries(name):
+            etch_app.update_search(name, entry.slug)
+    etch_app.flush_search_updates()
+    monkeypatch.undo()
+
+    monkeypatch.setitem(etch_app.search_config, 'save_delay', 60)
+    path = site / 'posts' / 'okapi.md'
+    path.write_text("---\ntitle: Okapi\ndate: 2024-01-01\nstatus: published\n---\n\nStripes.\n",
+                    encoding='utf-8')
+    try:
+        content_index.refresh(str(path.relative_to(site)))
+        assert not client.get('/api/search', query_string={'q': 'okapi'}).json['results']
+        etch_app.flush_search_updates()
+        results = client.get('/api/search', query_string={'q': 'okapi'}).json['results']
+        assert [result['slug'] for result in results] == ['okapi']
+    finally:
+        path.unlink()
+        content_index.remove(str(path.relative_to(site)))
+        etch_app.flush_search_updates()
+
+
+def test_sitemap_links_to_each_page_route(client):
+    paths = {path for path, _ in etch_app.sitemap_urls()}
+    for entry in content_index.entries('pages'):
+        if not getattr(entry.metadata, 'exclude_from_sitemap', False):
+            assert f'/{entry.slug}' in paths
+    assert not any(path.startswith('/pages/') for path in paths)
+    for path in paths:
+        assert client.get(path).status_code == 200
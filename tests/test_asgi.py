@@ -0,0 +1,48 @@
+"""Tests for the ASGI entry point"""
+import asyncio
+
+import asgi
+from app import content_index
+import utils
+
+
+def call(path, headers=()):
+    """Send one GET through the ASGI application; returns (status, headers, body)"""
+    sent = []
+    messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+        'headers': [(b'host', b'localhost')] + list(headers),
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 5000),
+        'scheme': 'http', 'http_version': '1.1', 'root_path': '',
+    }
+    asyncio.run(asgi.application(scope, receive, send))
+    return (sent[0]['status'], dict(sent[0]['headers']),
+            b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+def test_cached_responses_are_served_without_rendering(monkeypatch):
+    # The fast path is only taken while a watcher keeps the index current
+    monkeypatch.setattr(content_index, 'watching', True)
+    path = f"/posts/{content_index.entries('posts')[0].slug}"
+    status, headers, body = call(path)
+    assert status == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError("served from the cache through the app or a render")
+
+    # A render cache miss must not make validators render on the event loop
+    utils.render_cache.clear()
+    monkeypatch.setattr(utils, '_load_file', fail)
+    monkeypatch.setattr(asgi, 'call_wsgi', fail)
+
+    assert call(path) == (status, headers, body)
+    status, _, body = call(path, [(b'if-none-match', headers[b'etag'])])
+    assert (status, body) == (304, b'')
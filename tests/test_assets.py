@@ -0,0 +1,40 @@
+"""Tests for fingerprinted static assets"""
+import pytest
+
+from assets import AssetManifest, minify, minify_css
+
+
+@pytest.mark.parametrize('source, expected', [
+    ("a {\n  color: red;\n  margin: 0 auto;\n}\n", "a{color:red;margin:0 auto}"),
+    ("/* comment */ a , b > c { x: 1 }", "a,b>c{x:1}"),
+    ('a::after { content: "  /* kept */  ; " }', 'a::after{content:"  /* kept */  ; "}'),
+    ("a { content: '\\'  {' }", "a{content:'\\'  {'}"),
+    ("a:hover b :focus { top: 0 }", "a:hover b :focus{top:0}"),
+    ("@media (max-width: 600px) { a { top: 0; } }", "@media (max-width:600px){a{top:0}}"),
+])
+def test_minify_css(source, expected):
+    assert minify_css(source) == expected
+
+
+def test_only_css_is_minified():
+    script = b"if (x) /a  b/.test(s)\nlet y = 1\n"
+    assert minify('js/app.js', script) == script
+    assert minify('css/lib.min.css', b"a {  }") == b"a {  }"
+    assert minify('css/main.css', b"a {  }") == b"a{}"
+
+
+def test_load_uses_the_last_build(tmp_path):
+    static = tmp_path / 'static'
+    (static / 'css').mkdir(parents=True)
+    (static / 'css' / 'main.css').write_text("a { color: red; }", encoding='utf-8')
+
+    built = AssetManifest()
+    built.configure(static, tmp_path / 'assets')
+    assert not built.load()
+    assert built.build() == 1
+
+    loaded = AssetManifest()
+    loaded.configure(static, tmp_path / 'assets')
+    assert loaded.load()
+    assert loaded.hashed('css/main.css') == built.hashed('css/main.css') != 'css/main.css'
+    assert (tmp_path / 'assets' / loaded.hashed('css/main.css')).read_text() == "a{color:red}"
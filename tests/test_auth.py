@@ -0,0 +1,38 @@
+"""Tests for password verification and login throttling"""
+import threading
+
+import pytest
+
+from auth import BoundedExecutor, VerifierBusy
+
+
+def test_full_pool_refuses_work():
+    executor = BoundedExecutor(workers=1, max_pending=0)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+        return 'done'
+
+    thread = threading.Thread(target=lambda: executor.run(block))
+    thread.start()
+    started.wait()
+    try:
+        with pytest.raises(VerifierBusy):
+            executor.run(lambda: 'refused')
+    finally:
+        release.set()
+        thread.join()
+    assert executor.run(lambda: 'accepted') == 'accepted'
+
+
+def test_slow_check_times_out():
+    executor = BoundedExecutor(workers=1, max_pending=1, timeout=0.05)
+    release = threading.Event()
+    try:
+        with pytest.raises(VerifierBusy):
+            executor.run(release.wait)
+    finally:
+        release.set()
@@ -0,0 +1,33 @@
+"""Tests for the static export"""
+import pytest
+
+from build import output_name, site_routes
+from utils import content_index
+
+
+@pytest.fixture
+def tagged_post(site):
+    """A post with tags that need quoting in URLs"""
+    path = site / 'posts' / 'tagged.md'
+    path.write_text("---\ntitle: Tagged\ndate: 2024-01-01\nstatus: published\n"
+                    "tags: [interest rates, a/b, '..']\n---\n\nBody.\n", encoding='utf-8')
+    content_index.refresh(str(path.relative_to(site)))
+    yield
+    path.unlink()
+    content_index.remove(str(path.relative_to(site)))
+
+
+def test_listings_are_written_under_decoded_names(tagged_post):
+    routes = {url: path for url, path, _ in site_routes()}
+
+    assert routes['/tags/interest%20rates'] == 'tags/interest rates/index.html'
+    assert '/tags/a%2Fb' not in routes and '/tags/..' not in routes
+    assert all('%' not in path for url, path in routes.items() if url.startswith('/tags/'))
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('interest rates', 'interest rates'), ('C++', 'C++'), ('..', None), ('', None),
+    ('a/b', None), ('a\0b', None),
+])
+def test_output_name(value, expected):
+    assert output_name(value) == expected
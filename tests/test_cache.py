@@ -0,0 +1,129 @@
+"""Tests for the render caches"""
+import pickle
+import sqlite3
+import time
+
+import pytest
+
+from cache import DiskCache, LFUPolicy, LRUPolicy, RenderCache
+
+
+def test_lru_policy_evicts_least_recently_used():
+    policy = LRUPolicy()
+    for key in 'abc':
+        policy.add(key)
+    policy.touch('a')
+    assert policy.victim() == 'b'
+    policy.remove('b')
+    assert policy.victim() == 'c'
+
+
+def test_lfu_policy_evicts_least_frequently_used():
+    policy = LFUPolicy()
+    for key in 'abc':
+        policy.add(key)
+    policy.touch('a')
+    policy.touch('b')
+    assert policy.victim() == 'c'
+    policy.remove('c')
+    assert policy.victim() == 'a'  # Oldest of the keys used twice
+    policy.touch('a')
+    assert policy.victim() == 'b'
+    policy.add('d')
+    assert policy.victim() == 'd'
+
+
+@pytest.mark.parametrize('policy', ['lru', 'lfu'])
+def test_render_cache_stays_within_its_limits(policy):
+    cache = RenderCache(max_entries=3, max_bytes=10, policy=policy)
+    cache.put('a', 1, 'aaaa')
+    cache.put('b', 1, 'bbbb')
+    assert cache.get('a', 1) == 'aaaa'
+    cache.put('c', 1, 'cccc')  # 12 bytes: b is evicted under either policy
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) == 'aaaa' and cache.get('c', 1) == 'cccc'
+
+    cache.put('big', 1, 'x' * 11)  # Larger than the cap: never stored
+    assert cache.get('big', 1) is None
+    stats = cache.stats()
+    assert stats['bytes'] == 8 and stats['entries'] == 2 and stats['evictions'] == 1
+
+
+def test_render_cache_drops_stale_entries(monkeypatch):
+    cache = RenderCache(expires=lambda value: value[1])
+    cache.put('a', 1, ('old', None))
+    assert cache.get('a', 2) is None  # A newer version
+    assert cache.get('a', 1) is None
+
+    cache.put('b', 1, ('dynamic', 1000.0))
+    monkeypatch.setattr('cache.time.time', lambda: 999.0)
+    assert cache.get('b', 1) == ('dynamic', 1000.0)
+    monkeypatch.setattr('cache.time.time', lambda: 1000.0)
+    assert cache.get('b', 1) is None
+
+    cache.put('c', 1, ('static', None))
+    cache.invalidate('c')
+    assert cache.get('c', 1) is None
+    assert cache.stats()['invalidations'] == 3
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    return DiskCache(str(tmp_path / 'render.sqlite'), max_bytes=10_000)
+
+
+def stored_total(cache):
+    with sqlite3.connect(cache.path) as conn:
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+
+def test_running_total_matches_entries(disk_cache):
+    for i in range(20):
+        disk_cache.put(f"key-{i % 7}", 'x' * (100 * i))  # Replaces as well as inserts
+    assert disk_cache.size() == stored_total(disk_cache) <= disk_cache.max_bytes
+
+    disk_cache.clear()
+    assert disk_cache.size() == 0
+
+
+def test_total_is_computed_for_existing_databases(tmp_path):
+    path = str(tmp_path / 'render.sqlite')
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                     "size INTEGER NOT NULL, accessed REAL NOT NULL)")
+        blob = pickle.dumps('old')
+        conn.execute("INSERT INTO entries VALUES ('old', ?, ?, ?)", (blob, len(blob), time.time()))
+
+    cache = DiskCache(path)
+    assert cache.size() == len(blob)
+    assert cache.get('old') == 'old'
+
+
+def test_reads_do_not_write(disk_cache):
+    disk_cache.put('key', 'value')
+    # Another process holding the write lock mustn't block a hit
+    writer = sqlite3.connect(disk_cache.path)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        assert disk_cache.get('key') == 'value'
+        assert time.monotonic() - start < 1
+    finally:
+        writer.rollback()
+        writer.close()
+
+
+def test_eviction_keeps_recently_read_entries(disk_cache):
+    blob_size = len(pickle.dumps('x' * 3000, protocol=pickle.HIGHEST_PROTOCOL))
+    disk_cache.put('a', 'x' * 3000)
+    time.sleep(0.01)
+    disk_cache.put('b', 'x' * 3000)
+    time.sleep(0.01)
+    disk_cache.put('c', 'x' * 3000)
+    time.sleep(0.01)
+    disk_cache.get('a')  # Saved by the next put, before it evicts
+    disk_cache.put('d', 'x' * 3000)
+
+    assert disk_cache.get('a') is not None
+    assert disk_cache.get('b') is None
+    assert disk_cache.size() == 3 * blob_size
@@ -0,0 +1,102 @@
+"""Tests for the in-memory content index"""
+from datetime import datetime
+import os
+
+import utils
+from utils import ContentIndex
+
+
+def test_build_skips_malformed_frontmatter(content_dirs, write_post):
+    write_post(content_dirs['posts'], 'good', 'title: Good\ndate: 2024-01-01')
+    write_post(content_dirs['posts'], 'bad', 'title: "Bad\ndate: 2024-01-02')
+    write_post(content_dirs['posts'], 'list', '- not\n- a mapping')
+
+    index = ContentIndex()
+    index.build(content_dirs)
+
+    assert [entry.slug for entry in index.entries('posts')] == ['good']
+
+
+def test_refresh_keeps_previous_entry_on_malformed_frontmatter(content_dirs, write_post):
+    path = write_post(content_dirs['posts'], 'post', 'title: Before\ndate: 2024-01-01')
+    index = ContentIndex()
+    index.build(content_dirs)
+
+    write_post(content_dirs['posts'], 'post', 'title: "After\ndate: 2024-01-01')
+    entry = index.refresh(path)
+
+    assert entry is not None
+    assert entry.metadata.title == 'Before'
+    assert index.get('posts', 'post').metadata.title == 'Before'
+
+
+def test_mixed_timezones_sort_as_utc(content_dirs, write_post):
+    write_post(content_dirs['posts'], 'aware', 'title: Aware\ndate: 2024-05-01T10:00:00Z')
+    write_post(content_dirs['posts'], 'offset', 'title: Offset\ndate: 2024-05-01T09:00:00-02:00')
+    write_post(content_dirs['posts'], 'naive', 'title: Naive\ndate: 2024-05-01 10:30:00')
+    write_post(content_dirs['posts'], 'plain', 'title: Plain\ndate: 2024-05-01')
+
+    index = ContentIndex()
+    index.build(content_dirs)
+
+    assert [entry.slug for entry in index.entries('posts')] == ['offset', 'naive', 'aware', 'plain']
+    key = index.sort_key('posts', index.get('posts', 'aware'))
+    assert key == (datetime(2024, 5, 1, 10, 0), 'aware')
+
+
+def test_dynamic_flag_comes_from_source(content_dirs, write_post):
+    write_post(content_dirs['posts'], 'now', 'title: Now\ndate: 2024-01-01', 'Year {{ now.year }}')
+    write_post(content_dirs['posts'], 'local', 'title: Local\ndate: 2024-01-02',
+               '{% set x = 1 %}{{ x }}')
+    write_post(content_dirs['posts'], 'code', 'title: Code\ndate: 2024-01-03',
+               '```\n{{ now }}\n```')
+    write_post(content_dirs['posts'], 'broken', 'title: Broken\ndate: 2024-01-04', '{{ now')
+
+    index = ContentIndex()
+    index.build(content_dirs)
+
+    assert {entry.slug: entry.dynamic for entry in index.entries('posts')} == {
+        'now': True, 'local': False, 'code': False, 'broken': False}
+
+
+def test_refresh_reads_each_file_once(content_dirs, write_post, monkeypatch):
+    path = write_post(content_dirs['posts'], 'post', 'title: Post\ndate: 2024-01-01',
+                      'Year {{ now.year }}')
+    index = ContentIndex()
+    index.build(content_dirs)
+    opened = []
+
+    def counting_open(file, *args, **kwargs):
+        opened.append(file)
+        return open(file, *args, **kwargs)
+
+    monkeypatch.setattr(utils, 'open', counting_open, raising=False)
+    entry = index.refresh(path)
+
+    assert opened == [path]
+    assert entry.digest == utils.digest_files([path])
+    assert entry.metadata.title == 'Post' and entry.dynamic
+
+
+def test_frontmatter_is_split_at_the_closing_delimiter():
+    lines = ['\n', '  ---\n', 'title: T\n', 'tags: [a]\n', '--- rest\n', 'body\n']
+    assert utils._split_frontmatter(iter(lines)) == ('\ntitle: T\ntags: [a]\n', ' rest\n')
+    assert utils._split_frontmatter(iter(['---\n', 'title: T\n'])) == (None, None)
+    assert utils._split_frontmatter(iter(['title: T\n'])) == (None, None)
+
+
+def test_refresh_drops_the_old_render(content_dirs, write_post):
+    path = write_post(content_dirs['posts'], 'post', 'title: Post\ndate: 2024-01-01')
+    index = ContentIndex()
+    index.build(content_dirs)
+    key = os.path.normpath(path)
+    utils.render_cache.put(key, index.get('posts', 'post').mtime,
+                           ({}, '<p>Body</p>', None, None, ()))
+
+    index.refresh(path)  # Unchanged: the render stays
+    assert key in utils.render_cache._entries
+
+    later = os.path.getmtime(path) + 10
+    os.utime(path, (later, later))
+    index.refresh(path)
+    assert key not in utils.render_cache._entries
@@ -0,0 +1,38 @@
+"""Tests for feed items and serialization"""
+from datetime import datetime, timezone
+
+from feeds import atom_feed, build_items, json_feed
+from utils import ContentIndex
+
+
+def build(content_dirs):
+    index = ContentIndex()
+    index.build(content_dirs)
+    return build_items(index.entries('posts'))
+
+
+def test_unset_updated_date_stays_unset(content_dirs, write_post):
+    write_post(content_dirs['posts'], 'plain', 'title: Plain\ndate: 2024-01-01\ndescription: D')
+    write_post(content_dirs['posts'], 'edited',
+               'title: Edited\ndate: 2024-01-02\nupdated: 2024-02-01\ndescription: D')
+
+    items = {item.slug: item for item in build(content_dirs)}
+
+    assert items['plain'].updated is None
+    assert items['edited'].updated == datetime(2024, 2, 1, tzinfo=timezone.utc)
+
+
+def test_feeds_are_stable_between_builds(content_dirs, write_post):
+    write_post(content_dirs['posts'], 'plain', 'title: Plain\ndate: 2024-01-01\ndescription: D')
+    site = {'title': 'Blog'}
+    updated = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+    def serialize():
+        items = build(content_dirs)
+        return (atom_feed(items, site, 'http://x', 'http://x/atom.xml', updated),
+                json_feed(items, site, 'http://x', 'http://x/feed.json'))
+
+    first = serialize()
+    assert '<updated>2024-01-01T00:00:00+00:00</updated>' in first[0]
+    assert 'date_modified' not in first[1]
+    assert serialize() == first
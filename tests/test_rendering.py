@@ -0,0 +1,54 @@
+"""Tests for Markdown rendering"""
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+
+import utils
+from utils import render_markdown
+
+
+def documents():
+    """Varied documents: per-document state like headings and footnotes differs between them"""
+    docs = []
+    paths = glob.glob(os.path.join('posts', '*.md')) + glob.glob(os.path.join('pages', '*.md'))
+    for path in sorted(paths):
+        with open(path, encoding='utf-8') as f:
+            docs.append(f.read().split('---', 2)[-1])
+    for i in range(40):
+        docs.append(f"# Heading {i}\n\n## Section {i}\n\nText with a note.[^{i}]\n\n"
+                    f"| a | b |\n|---|---|\n| {i} | {i * i} |\n\n"
+                    f"```python\nprint({i})\n```\n\n[^{i}]: Footnote {i}.\n")
+    return docs
+
+
+def test_parallel_renders_match_serial():
+    docs = documents()
+    expected = [render_markdown(doc) for doc in docs]
+
+    # Many rounds over the same documents, interleaved across threads
+    work = docs * 10
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        rendered = list(executor.map(render_markdown, work))
+
+    assert rendered == expected * 10
+
+
+def test_prerender_reuses_the_index_analysis(monkeypatch):
+    body = "Year {{ now.year }}, {% set x = 2 %}{{ x }}\n\n```\n{{ literal }}\n```"
+    assert utils.uses_dynamic_context(body)
+
+    def fail(*args):
+        raise AssertionError("the body was analysed twice")
+
+    monkeypatch.setattr(utils.meta, 'find_undeclared_variables', fail)
+    now = utils.datetime(2024, 5, 1)
+    rendered, variables = utils.prerender(body, {'now': now})
+    assert rendered == "Year 2024, 2\n\n```\n{{ literal }}\n```"
+    assert variables == {'now'}
+
+
+def test_dynamic_window_follows_the_configured_ttl(monkeypatch):
+    monkeypatch.setattr(utils.jinja_env, 'bytecode_cache', utils.jinja_env.bytecode_cache)
+    monkeypatch.setattr(utils, '_dynamic_ttl', utils._dynamic_ttl)
+    utils.configure_jinja(dynamic_ttl=60)
+    assert utils.dynamic_window(125.0) == (120.0, 180.0)
@@ -0,0 +1,17 @@
+"""Tests for self-hosted third-party assets"""
+from vendor import VENDOR_ASSETS, VENDOR_DIR, vendor_urls, vendored_names
+
+
+def test_vendored_assets_are_found_once(tmp_path):
+    (tmp_path / VENDOR_DIR / 'katex').mkdir(parents=True)
+    (tmp_path / VENDOR_DIR / 'katex' / 'katex.min.css').write_text('', encoding='utf-8')
+    vendored = vendored_names(str(tmp_path))
+    assert vendored == {'katex/katex.min.css'}
+
+    (tmp_path / VENDOR_DIR / 'katex' / 'katex.min.js').write_text('', encoding='utf-8')
+    url_for = '/static/{}'.format
+    assert vendor_urls(vendored, 'katex/katex.min.css', url_for) == [
+        '/static/vendor/katex/katex.min.css']
+    # Vendored after the lookup was built: still the CDN until a restart
+    assert vendor_urls(vendored, 'katex/katex.min.js', url_for) == VENDOR_ASSETS[
+        'katex/katex.min.js']
@@ -0,0 +1,123 @@
+"""Tests for the content watchers"""
+import os
+import struct
+import sys
+import time
+
+import pytest
+
+from utils import ContentIndex
+import watcher
+from watcher import IN_Q_OVERFLOW, start_watcher
+
+BACKENDS = ['poll'] + (['inotify'] if sys.platform.startswith('linux') else [])
+
+# Longest a change may take to reach the index
+CONVERGE_SECONDS = 5.0
+
+
+def converge(check, timeout=CONVERGE_SECONDS):
+    """Wait until check() is true, failing after the timeout"""
+    deadline = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > deadline:
+            pytest.fail(f"index didn't converge within {timeout} s")
+        time.sleep(0.05)
+
+
+@pytest.fixture(params=BACKENDS)
+def watched_index(request, content_dirs):
+    index = ContentIndex()
+    index.build(content_dirs)
+    stopped = []
+    content_watcher = start_watcher(index.directories(), index.refresh, backend=request.param,
+                                    interval=0.1, on_exit=lambda: stopped.append(True))
+    assert content_watcher.backend == request.param
+    yield index, content_watcher, stopped
+    content_watcher.stop()
+    content_watcher.join(timeout=CONVERGE_SECONDS)
+
+
+def slugs(index):
+    return {entry.slug for entry in index.entries('posts')}
+
+
+def test_index_follows_changes(watched_index, content_dirs, write_post):
+    index, _, _ = watched_index
+    path = write_post(content_dirs['posts'], 'new', 'title: First\ndate: 2024-01-01')
+    converge(lambda: slugs(index) == {'new'})
+
+    # Keep the mtime moving on filesystems with coarse timestamps
+    time.sleep(0.01)
+    write_post(content_dirs['posts'], 'new', 'title: Second\ndate: 2024-01-01')
+    os.utime(path, (time.time() + 1, time.time() + 1))
+    converge(lambda: index.get('posts', 'new').metadata.title == 'Second')
+
+    os.rename(path, os.path.join(content_dirs['posts'], 'moved.md'))
+    converge(lambda: slugs(index) == {'moved'})
+
+    os.remove(os.path.join(content_dirs['posts'], 'moved.md'))
+    converge(lambda: slugs(index) == set())
+
+
+def test_undecodable_names_do_not_stop_the_watcher(watched_index, content_dirs, write_post):
+    index, content_watcher, stopped = watched_index
+    name = os.fsencode(content_dirs['posts']) + b'/caf\xe9.md'
+    with open(name, 'w', encoding='utf-8') as f:
+        f.write("---\ntitle: Latin-1\ndate: 2024-01-01\n---\n\nBody.\n")
+    converge(lambda: slugs(index) == {os.fsdecode(b'caf\xe9')})
+
+    write_post(content_dirs['posts'], 'after', 'title: After\ndate: 2024-01-02')
+    converge(lambda: 'after' in slugs(index))
+    assert content_watcher.is_alive() and not stopped
+
+
+@pytest.mark.skipif('inotify' not in BACKENDS, reason="inotify is Linux only")
+def test_inotify_overflow_rescans(content_dirs, write_post):
+    kept = write_post(content_dirs['posts'], 'kept', 'title: Kept\ndate: 2024-01-01')
+    gone = write_post(content_dirs['posts'], 'gone', 'title: Gone\ndate: 2024-01-02')
+    inotify = watcher.InotifyWatcher([content_dirs['posts']], lambda path: None)
+    try:
+        os.remove(gone)
+        added = write_post(content_dirs['posts'], 'added', 'title: Added\ndate: 2024-01-03')
+        overflow = struct.pack('iIII', -1, IN_Q_OVERFLOW, 0, 0)
+        # Deleted files are reported too, so the index drops them
+        assert sorted(inotify._parse(overflow)) == sorted([kept, gone, added])
+        assert sorted(inotify._parse(overflow)) == sorted([kept, added])
+    finally:
+        os.close(inotify._fd)
+
+
+def test_watcher_reports_when_it_stops(content_dirs):
+    stopped = []
+
+    class Failing(watcher.PollingWatcher):
+        def watch(self):
+            raise RuntimeError("boom")
+
+    failing = Failing([content_dirs['posts']], lambda path: None,
+                      on_exit=lambda: stopped.append(True))
+    failing.start()
+    failing.join(timeout=CONVERGE_SECONDS)
+    assert stopped == [True]
+
+
+@pytest.mark.skipif('inotify' not in BACKENDS, reason="inotify is Linux only")
+def test_polling_takes_over_when_inotify_dies(content_dirs, write_post):
+    index = ContentIndex()
+    index.build(content_dirs)
+    stopped = []
+    content_watcher = start_watcher(index.directories(), index.refresh, backend='inotify',
+                                    interval=0.1, on_exit=lambda: stopped.append(True))
+    try:
+        os.close(content_watcher._fd)  # The next read fails and ends the thread
+        content_watcher.join(timeout=CONVERGE_SECONDS)
+        assert not content_watcher.is_alive()
+
+        write_post(content_dirs['posts'], 'later', 'title: Later\ndate: 2024-01-01')
+        converge(lambda: slugs(index) == {'later'})
+        assert content_watcher.replacement.backend == 'poll' and not stopped
+    finally:
+        content_watcher.stop()
+    content_watcher.replacement.join(timeout=CONVERGE_SECONDS)
+    assert stopped == [True]